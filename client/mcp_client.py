@@ -8,7 +8,7 @@ from typing import Any, Optional
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-import json
+import orjson
 import sys
 import os
 
@@ -94,12 +94,13 @@ class QueryAssistantClient:
         
         # Parse JSON response
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def query_database(
         self,
         question: str,
         user_id: int = 1,
+        row_format: str = "records",
     ) -> dict[str, Any]:
         """
         Query database with natural language.
@@ -107,18 +108,19 @@ class QueryAssistantClient:
         Args:
             question: Natural language question
             user_id: User ID executing the query
+            row_format: "records" (list of dicts) or "columnar" (value lists)
         
         Returns:
             Query results with rows, columns, SQL, etc.
         """
         result = await self.session.call_tool(
             "query_database",
-            arguments={"question": question, "user_id": user_id}
+            arguments={"question": question, "user_id": user_id, "row_format": row_format}
         )
         
         # Parse JSON response
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def get_schema_info(self, table_name: str) -> dict[str, Any]:
         """
@@ -135,7 +137,7 @@ class QueryAssistantClient:
             arguments={"table_name": table_name}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def list_tables(self) -> dict[str, Any]:
         """
@@ -146,7 +148,7 @@ class QueryAssistantClient:
         """
         result = await self.session.call_tool("list_tables", arguments={})
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def save_query(
         self,
@@ -180,7 +182,7 @@ class QueryAssistantClient:
             }
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def load_saved_query(
         self,
@@ -202,7 +204,7 @@ class QueryAssistantClient:
             arguments={"query_id": query_id, "user_id": user_id}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def list_saved_queries(
         self,
@@ -224,7 +226,7 @@ class QueryAssistantClient:
             arguments={"user_id": user_id, "limit": limit}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def delete_saved_query(
         self,
@@ -246,7 +248,7 @@ class QueryAssistantClient:
             arguments={"query_id": query_id, "user_id": user_id}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def generate_chart(
         self,
@@ -280,7 +282,7 @@ class QueryAssistantClient:
             }
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def create_table_image(
         self,
@@ -304,7 +306,7 @@ class QueryAssistantClient:
             arguments={"data": data, "title": title, "max_rows": max_rows}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def get_query_history(
         self,
@@ -328,7 +330,7 @@ class QueryAssistantClient:
             arguments={"user_id": user_id, "limit": limit, "status": status}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def get_popular_queries(
         self,
@@ -350,7 +352,7 @@ class QueryAssistantClient:
             arguments={"limit": limit, "days": days}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def get_user_statistics(
         self,
@@ -372,7 +374,7 @@ class QueryAssistantClient:
             arguments={"user_id": user_id, "days": days}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def export_query_results(
         self,
@@ -403,7 +405,7 @@ class QueryAssistantClient:
             }
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def create_scheduled_report(
         self,
@@ -443,7 +445,7 @@ class QueryAssistantClient:
             }
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def list_scheduled_reports(
         self,
@@ -463,7 +465,7 @@ class QueryAssistantClient:
             arguments={"user_id": user_id}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def update_scheduled_report(
         self,
@@ -506,7 +508,7 @@ class QueryAssistantClient:
             }
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def delete_scheduled_report(
         self,
@@ -528,7 +530,7 @@ class QueryAssistantClient:
             arguments={"report_id": report_id, "user_id": user_id}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
     
     async def trigger_report_now(
         self,
@@ -543,14 +545,36 @@ class QueryAssistantClient:
             user_id: User ID
         
         Returns:
-            Execution status
+            Queued job ID and status
         """
         result = await self.session.call_tool(
             "trigger_report_now",
             arguments={"report_id": report_id, "user_id": user_id}
         )
         text_result = result.content[0].text if result.content else "{}"
-        return json.loads(text_result)
+        return orjson.loads(text_result)
+    
+    async def get_report_status(
+        self,
+        job_id: str,
+        user_id: int = 1,
+    ) -> dict[str, Any]:
+        """
+        Get the status of a report run queued with trigger_report_now.
+        
+        Args:
+            job_id: Job ID returned by trigger_report_now
+            user_id: User ID
+        
+        Returns:
+            Job status and execution result once finished
+        """
+        result = await self.session.call_tool(
+            "get_report_status",
+            arguments={"job_id": job_id, "user_id": user_id}
+        )
+        text_result = result.content[0].text if result.content else "{}"
+        return orjson.loads(text_result)
 
 
 # Convenience function for quick queries
@@ -14,18 +14,28 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create query_history table
+-- Create query_texts table (distinct question/SQL pairs, keyed by
+-- md5(question || NUL || generated_sql); see server.tools.history.query_fingerprint)
+CREATE TABLE IF NOT EXISTS query_texts (
+    fingerprint BYTEA PRIMARY KEY,
+    question TEXT NOT NULL,
+    generated_sql TEXT NOT NULL
+);
+
+-- Create query_history table, range-partitioned by month on created_at
+-- (partitions are created ahead by the ensure_query_history_partitions task)
 CREATE TABLE IF NOT EXISTS query_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    question TEXT NOT NULL,
-    generated_sql TEXT NOT NULL,
-    status VARCHAR(20) NOT NULL,
+    query_fingerprint BYTEA NOT NULL REFERENCES query_texts(fingerprint),
+    status VARCHAR(20) NOT NULL
+        CONSTRAINT ck_query_history_status CHECK (status IN ('pending', 'running', 'success', 'failed')),
     result_rows INTEGER,
     execution_time_ms FLOAT,
     error_message TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 -- Create saved_queries table
 CREATE TABLE IF NOT EXISTS saved_queries (
@@ -240,8 +250,128 @@ ON CONFLICT (user_id, schema_name, table_name) DO NOTHING;
 -- Create Indexes for Performance
 -- ============================================
 
+-- Move question/SQL text out of existing query_history tables into query_texts
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'query_history' AND column_name = 'question'
+    ) THEN
+        ALTER TABLE query_history ADD COLUMN IF NOT EXISTS query_fingerprint BYTEA;
+        UPDATE query_history
+        SET query_fingerprint = decode(md5(convert_to(question, 'UTF8') || '\x00'::bytea || convert_to(generated_sql, 'UTF8')), 'hex')
+        WHERE query_fingerprint IS NULL;
+        
+        INSERT INTO query_texts (fingerprint, question, generated_sql)
+        SELECT DISTINCT ON (query_fingerprint) query_fingerprint, question, generated_sql
+        FROM query_history
+        ON CONFLICT (fingerprint) DO NOTHING;
+        
+        ALTER TABLE query_history
+            ALTER COLUMN query_fingerprint SET NOT NULL,
+            ADD FOREIGN KEY (query_fingerprint) REFERENCES query_texts(fingerprint),
+            DROP COLUMN question,
+            DROP COLUMN generated_sql;
+    END IF;
+END $$;
+-- Existing tables: enforce the status values as a plain CHECK
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'ck_query_history_status'
+    ) THEN
+        ALTER TABLE query_history ADD CONSTRAINT ck_query_history_status
+            CHECK (status IN ('pending', 'running', 'success', 'failed'));
+    END IF;
+END $$;
+-- Existing unpartitioned query_history: copy it into a partitioned table,
+-- keeping the id sequence so ids continue where they left off
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE relname = 'query_history' AND relkind = 'r' AND relnamespace = 'public'::regnamespace
+    ) THEN
+        ALTER TABLE query_history RENAME TO query_history_legacy;
+        ALTER INDEX query_history_pkey RENAME TO query_history_legacy_pkey;
+        
+        CREATE TABLE query_history (
+            id INTEGER NOT NULL DEFAULT nextval('query_history_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            query_fingerprint BYTEA NOT NULL REFERENCES query_texts(fingerprint),
+            status VARCHAR(20) NOT NULL
+                CONSTRAINT ck_query_history_status CHECK (status IN ('pending', 'running', 'success', 'failed')),
+            result_rows INTEGER,
+            execution_time_ms FLOAT,
+            error_message TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        ALTER SEQUENCE query_history_id_seq OWNED BY query_history.id;
+        CREATE TABLE query_history_default PARTITION OF query_history DEFAULT;
+        
+        FOR month_start IN
+            SELECT generate_series(
+                date_trunc('month', min(created_at)),
+                date_trunc('month', CURRENT_TIMESTAMP) + interval '2 months',
+                interval '1 month'
+            )
+            FROM query_history_legacy
+        LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF query_history FOR VALUES FROM (%L) TO (%L)',
+                'query_history_p' || to_char(month_start, 'YYYY_MM'),
+                month_start,
+                month_start + interval '1 month'
+            );
+        END LOOP;
+        
+        INSERT INTO query_history (
+            id, user_id, query_fingerprint, status, result_rows,
+            execution_time_ms, error_message, created_at
+        )
+        SELECT
+            id, user_id, query_fingerprint, status, result_rows,
+            execution_time_ms, error_message, COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM query_history_legacy;
+        
+        DROP TABLE query_history_legacy;
+    END IF;
+END $$;
+-- Current and next two months, plus a default partition for anything outside them
+CREATE TABLE IF NOT EXISTS query_history_default PARTITION OF query_history DEFAULT;
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_TIMESTAMP),
+            date_trunc('month', CURRENT_TIMESTAMP) + interval '2 months',
+            interval '1 month'
+        )
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF query_history FOR VALUES FROM (%L) TO (%L)',
+            'query_history_p' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+    END LOOP;
+END $$;
 CREATE INDEX IF NOT EXISTS idx_query_history_user_id ON query_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_query_history_created_at ON query_history(created_at);
+CREATE INDEX IF NOT EXISTS ix_query_history_query_fingerprint ON query_history(query_fingerprint);
+
+-- Query history reads: per-user list/statistics and popular successful queries
+CREATE INDEX IF NOT EXISTS idx_history_user_created ON query_history(user_id, created_at DESC)
+    INCLUDE (status, execution_time_ms, result_rows);
+CREATE INDEX IF NOT EXISTS idx_history_user_success ON query_history(user_id, created_at DESC)
+    WHERE status = 'success';
+CREATE INDEX IF NOT EXISTS idx_history_success_created ON query_history(created_at)
+    WHERE status = 'success';
 CREATE INDEX IF NOT EXISTS idx_saved_queries_user_id ON saved_queries(user_id);
 CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id);
 CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date);
@@ -9,7 +9,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Any
 from contextlib import asynccontextmanager
 import asyncio
 from datetime import datetime
@@ -98,11 +98,12 @@ class QueryRequest(BaseModel):
     question: str
     output_format: Optional[str] = Field(default="table", description="table, json, or csv")
     chart_type: Optional[str] = Field(default=None, description="bar, line, pie, scatter, or null")
+    row_format: Optional[str] = Field(default="records", description="records or columnar")
 
 class QueryResponse(BaseModel):
     status: str
     columns: List[str]
-    rows: List[Dict[str, Any]]
+    rows: List[Any]  # dicts, or value lists when row_format is columnar
     rowCount: int  # camelCase for frontend
     columnCount: int
     executionTime: float  # camelCase for frontend (in ms)
@@ -223,7 +224,8 @@ async def execute_query(
         # Execute the query using persistent MCP client with authenticated user
         result = await mcp_client.query_database(
             request.question,
-            current_user.id  # Use authenticated user's ID
+            current_user.id,  # Use authenticated user's ID
+            row_format=request.row_format or "records",
         )
         
         # Debug logging
@@ -717,15 +719,11 @@ async def execute_scheduled_report(
         if result.get("error"):
             raise HTTPException(status_code=400, detail=result["error"])
         
-        # Return detailed response format like the newer endpoint
+        # Report runs in the background on the MCP server; poll the job for results
         return {
-            "status": "success",
-            "message": result.get("message", "Report executed successfully"),
-            "execution_time": result.get("execution_time"),
-            "row_count": result.get("row_count"),
-            "email_status": result.get("email_status", "Unknown"),
-            "emails_sent": result.get("emails_sent", 0),
-            "recipients_count": result.get("recipients_count", 0)
+            "status": result.get("status", "queued"),
+            "job_id": result.get("job_id"),
+            "message": result.get("message", "Report queued for execution"),
         }
     
     except HTTPException:
@@ -733,6 +731,32 @@ async def execute_scheduled_report(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/reports/jobs/{job_id}")
+async def get_report_job_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """Get the status of a queued report execution"""
+    try:
+        if not mcp_client:
+            raise HTTPException(status_code=503, detail="MCP client not initialized")
+        
+        result = await mcp_client.call_tool(
+            "get_report_status",
+            job_id=job_id,
+            user_id=current_user.id
+        )
+        
+        if result.get("status") == "not_found":
+            raise HTTPException(status_code=404, detail=result["error"])
+        
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Error handler
 
 @app.post("/api/export")
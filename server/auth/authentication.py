@@ -20,11 +20,14 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 import warnings
 warnings.filterwarnings("ignore", message=".*bcrypt.*version.*", category=UserWarning)
 
+# bcrypt work factor; dev/test databases can lower it (minimum 4) to seed quickly
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # Password hashing with explicit bcrypt configuration to avoid version warnings
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12,
+    bcrypt__rounds=BCRYPT_ROUNDS,
     bcrypt__ident="2b"
 )
 
@@ -7,6 +7,7 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from server.cache import cache
 from server.db.models import RolePermission, User, UserRole
 
 
@@ -61,6 +62,7 @@ async def grant_table_permission(
     
     await session.commit()
     await session.refresh(permission)
+    await cache.bump_permission_version(user_id)
     
     return permission
 
@@ -95,6 +97,7 @@ async def revoke_table_permission(
     if permission:
         await session.delete(permission)
         await session.commit()
+        await cache.bump_permission_version(user_id)
         return True
     
     return False
@@ -125,6 +128,7 @@ async def update_user_role(
         user.role = new_role
         await session.commit()
         await session.refresh(user)
+        await cache.bump_permission_version(user_id)
     
     return user
 
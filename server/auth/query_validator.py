@@ -3,11 +3,54 @@ SQL query validator for security and safety.
 Prevents SQL injection and dangerous operations.
 """
 import re
+from functools import lru_cache
 from typing import Optional
 
 import sqlparse
-from sqlparse.sql import Statement
-from sqlparse.tokens import Keyword, DML
+from sqlparse.sql import Identifier, IdentifierList, Parenthesis, Statement, TokenList
+from sqlparse.tokens import CTE, Comment, Keyword, DML
+
+
+# Number of distinct SQL strings whose validation/table extraction is memoized
+VALIDATION_CACHE_SIZE = 4096
+
+
+def _trie_pattern(words: set[str]) -> str:
+    """
+    Build a regex alternation of words factored into a prefix trie.
+    
+    e.g. {"EXEC", "EXECUTE", "DROP"} -> "(?:DROP|EXEC(?:UTE)?)". Shared
+    prefixes are matched once, so the regex engine walks a single automaton
+    instead of retrying every keyword at each position.
+    
+    Args:
+        words: Literal words to match
+    
+    Returns:
+        Regex source matching exactly the given words
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of word
+    
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word can also end here (e.g. EXEC before EXECUTE)
+        return f"(?:{body})?" if "" in node else body
+    
+    return build(trie)
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _parse(sql_normalized: str) -> tuple[Statement, ...]:
+    """Parse whitespace-normalized SQL once for validation and table extraction."""
+    return sqlparse.parse(sql_normalized)
 
 
 class QueryValidationError(Exception):
@@ -51,7 +94,21 @@ class QueryValidator:
         r"UNION.*SELECT",  # UNION-based injection
     ]
     
+    # Each list is folded into one alternation so a query is scanned once per
+    # list instead of once per pattern; the named group identifies the match.
+    # Keywords are plain literals, so they are factored into a prefix trie.
+    _FORBIDDEN_KEYWORD_RE = re.compile(
+        r"\b(?P<keyword>" + _trie_pattern(FORBIDDEN_KEYWORDS) + r")\b"
+    )
+    _SUSPICIOUS_PATTERN_RE = re.compile(
+        "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(SUSPICIOUS_PATTERNS)),
+        re.IGNORECASE,
+    )
+    _TABLE_NAME_RE = re.compile(r"^[a-zA-Z0-9_\.]+$")
+    _COLUMN_NAME_RE = re.compile(r"^[a-zA-Z0-9_]+$")
+    
     @staticmethod
+    @lru_cache(maxsize=VALIDATION_CACHE_SIZE)
     def validate_query(sql: str, allow_write: bool = False) -> tuple[bool, Optional[str]]:
         """
         Validate SQL query for security and safety.
@@ -72,20 +129,20 @@ class QueryValidator:
         
         # Check for forbidden keywords
         if not allow_write:
-            for keyword in QueryValidator.FORBIDDEN_KEYWORDS:
-                # Use word boundaries to avoid false positives (e.g., "DROP" in "BACKDROP")
-                pattern = r"\b" + keyword + r"\b"
-                if re.search(pattern, sql_upper):
-                    return False, f"Forbidden keyword: {keyword}. Only SELECT queries are allowed."
+            # Word boundaries avoid false positives (e.g., "DROP" in "BACKDROP")
+            match = QueryValidator._FORBIDDEN_KEYWORD_RE.search(sql_upper)
+            if match:
+                return False, f"Forbidden keyword: {match.group('keyword')}. Only SELECT queries are allowed."
         
         # Check for suspicious patterns
-        for pattern in QueryValidator.SUSPICIOUS_PATTERNS:
-            if re.search(pattern, sql_upper, re.IGNORECASE):
-                return False, f"Suspicious pattern detected: {pattern}"
+        match = QueryValidator._SUSPICIOUS_PATTERN_RE.search(sql_upper)
+        if match:
+            pattern = QueryValidator.SUSPICIOUS_PATTERNS[int(match.lastgroup[1:])]
+            return False, f"Suspicious pattern detected: {pattern}"
         
         # Parse SQL to check structure
         try:
-            parsed = sqlparse.parse(sql_normalized)
+            parsed = _parse(sql_normalized)
             if not parsed:
                 return False, "Could not parse SQL query"
             
@@ -121,7 +178,7 @@ class QueryValidator:
             QueryValidationError: If table name is invalid
         """
         # Allow only alphanumeric, underscore, and dot (for schema.table)
-        if not re.match(r"^[a-zA-Z0-9_\.]+$", table_name):
+        if not QueryValidator._TABLE_NAME_RE.match(table_name):
             raise QueryValidationError(
                 f"Invalid table name: {table_name}. Only alphanumeric and underscore allowed."
             )
@@ -143,7 +200,7 @@ class QueryValidator:
             QueryValidationError: If column name is invalid
         """
         # Allow only alphanumeric and underscore
-        if not re.match(r"^[a-zA-Z0-9_]+$", column_name):
+        if not QueryValidator._COLUMN_NAME_RE.match(column_name):
             raise QueryValidationError(
                 f"Invalid column name: {column_name}. Only alphanumeric and underscore allowed."
             )
@@ -161,43 +218,106 @@ class QueryValidator:
         Returns:
             List of table names found in the query
         """
-        tables = []
+        return list(QueryValidator._extract_tables(sql))
+    
+    @staticmethod
+    @lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+    def _extract_tables(sql: str) -> tuple[str, ...]:
+        """
+        Memoized table extraction; returns an immutable tuple.
+        
+        Fails closed: if any part of the FROM/JOIN clauses can't be
+        classified, no tables are returned so the query is rejected.
+        """
+        tables: list[str] = []
         
         try:
-            parsed = sqlparse.parse(sql)
+            parsed = _parse(" ".join(sql.split()))
             if not parsed:
-                return tables
-            
-            statement = parsed[0]
+                return ()
             
-            # Extract FROM clause tables
-            from_seen = False
-            for token in statement.tokens:
-                if from_seen:
-                    if token.ttype is Keyword:
-                        break
-                    # Get table name
-                    if hasattr(token, "get_real_name"):
-                        table_name = token.get_real_name()
-                        if table_name:
-                            tables.append(table_name)
-                    elif not token.is_whitespace:
-                        # Handle simple table names
-                        table_str = str(token).strip()
-                        if table_str and not table_str.upper() in ["AS", "ON", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER"]:
-                            # Remove aliases
-                            table_name = table_str.split()[0]
-                            if table_name:
-                                tables.append(table_name)
-                
-                if token.ttype is Keyword and token.value.upper() == "FROM":
-                    from_seen = True
+            QueryValidator._collect_tables(parsed[0].tokens, tables, frozenset())
             
         except Exception:
-            # If parsing fails, return empty list
-            pass
+            # Unparseable or unsupported FROM items: report nothing
+            return ()
+        
+        # Remove duplicates, keeping first-seen order
+        return tuple(dict.fromkeys(tables))
+    
+    @staticmethod
+    def _folded_name(token) -> str:
+        """Fold an identifier the way Postgres does (unquoted names are lowercased)."""
+        value = token.value
+        if value.startswith('"') and value.endswith('"'):
+            return value[1:-1].replace('""', '"')
+        return value.lower()
+    
+    @staticmethod
+    def _collect_tables(tokens: list, tables: list[str], ctes: frozenset[str]) -> None:
+        """
+        Collect table names following FROM/JOIN, walking into subqueries.
         
-        return list(set(tables))  # Remove duplicates
+        CTE names are scoped: a CTE only shadows tables in the statement
+        after its own definition (later CTE bodies and the main query),
+        so a CTE body reading a same-named table still reports that table.
+        
+        Args:
+            tokens: Tokens of one level of the parse tree
+            tables: Table names found so far (appended to)
+            ctes: Folded CTE names visible at this level
+        
+        Raises:
+            ValueError: If a FROM/JOIN or WITH item isn't a table, CTE or subquery
+        """
+        visible = set(ctes)  # CTEs defined at this level stay at this level
+        in_select = False  # FROM also appears in EXTRACT(... FROM ...) etc.
+        expect = None  # "table" after FROM/JOIN, "cte" after WITH
+        
+        for token in tokens:
+            if token.is_whitespace or token.ttype in Comment:
+                continue
+            
+            if expect is not None:
+                items = token.get_identifiers() if isinstance(token, IdentifierList) else [token]
+                for item in items:
+                    is_subquery = isinstance(item, Parenthesis) or (
+                        isinstance(item, Identifier)
+                        and any(isinstance(child, Parenthesis) for child in item.tokens)
+                    )
+                    if expect == "cte":
+                        if not (isinstance(item, Identifier) and is_subquery):
+                            raise ValueError(f"Unsupported CTE definition: {item}")
+                        # The body only sees CTEs defined before this one
+                        QueryValidator._collect_tables(item.tokens, tables, frozenset(visible))
+                        visible.add(QueryValidator._folded_name(item.token_first(skip_cm=True)))
+                    elif is_subquery:
+                        # Subquery: its tables count too
+                        QueryValidator._collect_tables(item.tokens, tables, frozenset(visible))
+                    elif isinstance(item, Identifier):
+                        # Schema-qualified names always refer to real tables
+                        if (
+                            item.get_parent_name() is None
+                            and QueryValidator._folded_name(item.token_first(skip_cm=True)) in visible
+                        ):
+                            continue
+                        tables.append(item.get_real_name())
+                    else:
+                        # e.g. ONLY, LATERAL or a bare function: fail closed
+                        raise ValueError(f"Unsupported FROM item: {item}")
+                expect = None
+                continue
+            
+            if token.ttype is CTE:
+                expect = "cte"
+            elif token.ttype is DML and token.normalized == "SELECT":
+                in_select = True
+            elif token.ttype is Keyword and (
+                (in_select and token.normalized == "FROM") or token.normalized.endswith("JOIN")
+            ):
+                expect = "table"
+            elif isinstance(token, TokenList):
+                QueryValidator._collect_tables(token.tokens, tables, frozenset(visible))
     
     @staticmethod
     def estimate_query_cost(sql: str) -> dict:
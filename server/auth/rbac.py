@@ -82,6 +82,79 @@ class RBACManager:
         
         return permission.can_read, permissions
     
+    @staticmethod
+    async def check_tables_access(
+        user_id: int,
+        database: str,
+        tables: list[str],
+        session: AsyncSession,
+    ) -> dict[str, Optional[dict]]:
+        """
+        Check a user's access to several tables at once.
+        
+        Cached permissions are read in one round-trip and the remaining
+        tables are resolved with a single database query.
+        
+        Args:
+            user_id: User ID
+            database: Database name
+            tables: Table names
+            session: Database session
+        
+        Returns:
+            Mapping of table name to permissions dict, or None if denied
+        """
+        access = await cache.get_user_permissions_many(user_id, database, tables)
+        missing = [table for table, perms in access.items() if perms is None]
+        if not missing:
+            return {
+                table: perms if perms.get("can_read", False) else None
+                for table, perms in access.items()
+            }
+        
+        # Fetch user and their role
+        user_result = await session.execute(
+            select(User).where(User.id == user_id, User.is_active == True)
+        )
+        user = user_result.scalar_one_or_none()
+        
+        if not user:
+            return {table: None for table in tables}
+        
+        fetched: dict[str, dict] = {}
+        if user.role == UserRole.ADMIN:
+            # Admins have access to everything
+            for table in missing:
+                fetched[table] = {
+                    "can_read": True,
+                    "allowed_columns": None,  # All columns
+                    "row_filter": None,
+                }
+        else:
+            # Check specific table permissions for all remaining tables at once
+            perm_result = await session.execute(
+                select(RolePermission).where(
+                    RolePermission.user_id == user_id,
+                    RolePermission.database_name == database,
+                    RolePermission.table_name.in_(missing),
+                )
+            )
+            for permission in perm_result.scalars():
+                fetched[permission.table_name] = {
+                    "can_read": permission.can_read,
+                    "allowed_columns": permission.allowed_columns,
+                    "row_filter": permission.row_filter,
+                }
+        
+        # Cache the permissions (no explicit permission = no access, not cached)
+        await cache.set_user_permissions_many(user_id, database, fetched)
+        access.update(fetched)
+        
+        return {
+            table: perms if perms and perms.get("can_read", False) else None
+            for table, perms in access.items()
+        }
+    
     @staticmethod
     async def get_user_role(user_id: int, session: AsyncSession) -> Optional[UserRole]:
         """
@@ -173,7 +246,20 @@ class RBACManager:
         if not has_access or not permissions:
             raise PermissionError(f"User {user_id} has no access to {database}.{table}")
         
-        row_filter = permissions.get("row_filter")
+        return RBACManager.add_row_filter(base_sql, permissions.get("row_filter"))
+    
+    @staticmethod
+    def add_row_filter(base_sql: str, row_filter: Optional[str]) -> str:
+        """
+        Add a row-level security filter to a SQL query's WHERE clause.
+        
+        Args:
+            base_sql: Base SQL query
+            row_filter: SQL boolean expression to enforce (None = no filter)
+        
+        Returns:
+            Modified SQL with the row filter applied
+        """
         if not row_filter:
             return base_sql
         
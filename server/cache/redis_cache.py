@@ -6,6 +6,7 @@ import hashlib
 import json
 from typing import Any, Optional
 
+import orjson
 import redis.asyncio as aioredis
 from redis.asyncio.connection import ConnectionPool
 
@@ -19,13 +20,18 @@ class RedisCache:
     QUERY_RESULT_PREFIX = "query:result:"
     SCHEMA_META_PREFIX = "schema:meta:"
     USER_PERM_PREFIX = "user:perm:"
+    USER_PERM_VERSION_PREFIX = "user:perm_version:"
     RATE_LIMIT_PREFIX = "rate:limit:"
+    POPULAR_QUERIES_PREFIX = "history:popular:"
+    HISTORY_ENTRY_PREFIX = "history:entry:"
     
     # Cache TTLs (in seconds)
     QUERY_RESULT_TTL = settings.query_cache_ttl_seconds  # 5 minutes
     SCHEMA_META_TTL = 3600  # 1 hour
     USER_PERM_TTL = 900  # 15 minutes
     RATE_LIMIT_TTL = 3600  # 1 hour
+    POPULAR_QUERIES_TTL = 300  # 5 minutes
+    HISTORY_ENTRY_TTL = 3600  # 1 hour (history rows are never updated)
     
     def __init__(self):
         self._pool: Optional[ConnectionPool] = None
@@ -85,6 +91,23 @@ class RedisCache:
         hash_digest = hashlib.sha256(content.encode()).hexdigest()
         return f"{RedisCache.QUERY_RESULT_PREFIX}{hash_digest}"
     
+    @staticmethod
+    def _generate_user_query_key(
+        sql: str, user_id: int, params: Optional[dict] = None
+    ) -> str:
+        """Generate a per-user cache key for validated query results."""
+        content = f"{user_id}|{sql}"
+        if params:
+            content += json.dumps(params, sort_keys=True)
+        
+        hash_digest = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+        return f"{RedisCache.QUERY_RESULT_PREFIX}{user_id}:{hash_digest}"
+    
+    @staticmethod
+    def _generate_permission_version_key(user_id: int) -> str:
+        """Generate cache key for a user's permission version counter."""
+        return f"{RedisCache.USER_PERM_VERSION_PREFIX}{user_id}"
+    
     @staticmethod
     def _generate_schema_key(database: str, table: str) -> str:
         """Generate cache key for schema metadata."""
@@ -95,6 +118,16 @@ class RedisCache:
         """Generate cache key for user permissions."""
         return f"{RedisCache.USER_PERM_PREFIX}{user_id}:{database}:{table}"
     
+    @staticmethod
+    def _generate_popular_queries_key(days: int, limit: int) -> str:
+        """Generate cache key for the popular queries aggregate."""
+        return f"{RedisCache.POPULAR_QUERIES_PREFIX}{days}:{limit}"
+    
+    @staticmethod
+    def _generate_history_entry_key(user_id: int, query_id: int) -> str:
+        """Generate cache key for a single query history record."""
+        return f"{RedisCache.HISTORY_ENTRY_PREFIX}{user_id}:{query_id}"
+    
     @staticmethod
     def _generate_rate_limit_key(user_id: int) -> str:
         """Generate cache key for rate limiting."""
@@ -116,7 +149,7 @@ class RedisCache:
         try:
             data = await self.client.get(key)
             if data:
-                return json.loads(data.decode())
+                return orjson.loads(data)
             return None
         except Exception:
             return None
@@ -139,7 +172,7 @@ class RedisCache:
             return False
         
         try:
-            data = json.dumps(value).encode()
+            data = orjson.dumps(value)
             if expire:
                 await self.client.setex(key, expire, data)
             else:
@@ -148,6 +181,57 @@ class RedisCache:
         except Exception:
             return False
     
+    async def get_many(self, keys: list[str]) -> list[Optional[dict]]:
+        """
+        Get several cached values in one round-trip.
+        
+        Args:
+            keys: Cache keys
+        
+        Returns:
+            Cached values in key order, None for missing keys
+        """
+        if self._disabled or self._client is None or not keys:
+            return [None] * len(keys)
+        
+        try:
+            values = await self.client.mget(keys)
+        except Exception:
+            return [None] * len(keys)
+        
+        return [orjson.loads(data) if data else None for data in values]
+    
+    async def set_many(
+        self, values: dict[str, dict], expire: Optional[int] = None
+    ) -> bool:
+        """
+        Set several cached values in one pipelined round-trip.
+        
+        Args:
+            values: Mapping of cache key to value (must be JSON serializable)
+            expire: Expiration time in seconds (optional)
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if self._disabled or self._client is None:
+            return False
+        if not values:
+            return True
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    data = orjson.dumps(value)
+                    if expire:
+                        pipe.setex(key, expire, data)
+                    else:
+                        pipe.set(key, data)
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
+    
     async def get_query_result(
         self, sql: str, params: Optional[dict] = None
     ) -> Optional[list[dict]]:
@@ -167,7 +251,7 @@ class RedisCache:
         if data is None:
             return None
         
-        return json.loads(data.decode("utf-8"))
+        return orjson.loads(data)
     
     async def set_query_result(
         self, sql: str, result: list[dict], params: Optional[dict] = None
@@ -181,9 +265,101 @@ class RedisCache:
             params: Query parameters
         """
         key = self._generate_query_key(sql, params)
-        data = json.dumps(result).encode("utf-8")
+        data = orjson.dumps(result)
         await self.client.setex(key, self.QUERY_RESULT_TTL, data)
     
+    async def get_user_query_result(
+        self, sql: str, user_id: int, params: Optional[dict] = None
+    ) -> Optional[dict[str, Any]]:
+        """
+        Get a cached, already validated query result for a user.
+        
+        The entry is only returned if it was stored under the user's current
+        permission version, so permission changes invalidate it.
+        
+        Args:
+            sql: SQL query string as submitted (before row-level security)
+            user_id: User ID the result was produced for
+            params: Query parameters
+        
+        Returns:
+            Dict with "sql" (executed SQL), "columns" and "rows" (value lists),
+            or None if not found
+        """
+        if self._disabled or self._client is None:
+            return None
+        
+        key = self._generate_user_query_key(sql, user_id, params)
+        version_key = self._generate_permission_version_key(user_id)
+        try:
+            data, version = await self.client.mget(key, version_key)
+        except Exception:
+            return None
+        
+        if data is None:
+            return None
+        
+        entry = orjson.loads(data)
+        current_version = int(version) if version else 0
+        if not entry.get("validated") or entry.get("rbac_version") != current_version:
+            return None
+        
+        return entry
+    
+    async def set_user_query_result(
+        self,
+        sql: str,
+        user_id: int,
+        executed_sql: str,
+        columns: list[str],
+        rows: list[list],
+        params: Optional[dict] = None,
+    ) -> None:
+        """
+        Cache a validated query result for a user.
+        
+        Args:
+            sql: SQL query string as submitted (before row-level security)
+            user_id: User ID the result was produced for
+            executed_sql: SQL that was actually executed
+            columns: Result column names
+            rows: Result rows as value lists ordered like columns
+            params: Query parameters
+        """
+        if self._disabled or self._client is None:
+            return
+        
+        key = self._generate_user_query_key(sql, user_id, params)
+        try:
+            version = await self.client.get(self._generate_permission_version_key(user_id))
+            entry = {
+                "validated": True,
+                "rbac_version": int(version) if version else 0,
+                "sql": executed_sql,
+                "columns": columns,
+                "rows": rows,
+            }
+            await self.client.setex(
+                key, self.QUERY_RESULT_TTL, orjson.dumps(entry)
+            )
+        except Exception:
+            pass
+    
+    async def bump_permission_version(self, user_id: int) -> None:
+        """
+        Invalidate a user's cached query results after a permission change.
+        
+        Args:
+            user_id: User ID whose permissions changed
+        """
+        if self._disabled or self._client is None:
+            return
+        
+        try:
+            await self.client.incr(self._generate_permission_version_key(user_id))
+        except Exception:
+            pass
+    
     async def get_schema_metadata(
         self, database: str, table: str
     ) -> Optional[dict[str, Any]]:
@@ -203,7 +379,7 @@ class RedisCache:
         if data is None:
             return None
         
-        return json.loads(data.decode("utf-8"))
+        return orjson.loads(data)
     
     async def set_schema_metadata(
         self, database: str, table: str, metadata: dict[str, Any]
@@ -217,7 +393,7 @@ class RedisCache:
             metadata: Schema metadata to cache
         """
         key = self._generate_schema_key(database, table)
-        data = json.dumps(metadata).encode("utf-8")
+        data = orjson.dumps(metadata)
         await self.client.setex(key, self.SCHEMA_META_TTL, data)
     
     async def get_user_permissions(
@@ -240,7 +416,7 @@ class RedisCache:
         if data is None:
             return None
         
-        return json.loads(data.decode("utf-8"))
+        return orjson.loads(data)
     
     async def set_user_permissions(
         self, user_id: int, database: str, table: str, permissions: dict[str, Any]
@@ -255,14 +431,124 @@ class RedisCache:
             permissions: User permissions to cache
         """
         key = self._generate_permission_key(user_id, database, table)
-        data = json.dumps(permissions).encode("utf-8")
+        data = orjson.dumps(permissions)
         await self.client.setex(key, self.USER_PERM_TTL, data)
     
+    async def get_user_permissions_many(
+        self, user_id: int, database: str, tables: list[str]
+    ) -> dict[str, Optional[dict[str, Any]]]:
+        """
+        Get cached user permissions for several tables in one round-trip.
+        
+        Args:
+            user_id: User ID
+            database: Database name
+            tables: Table names
+        
+        Returns:
+            Mapping of table name to permissions (None if not cached)
+        """
+        keys = [self._generate_permission_key(user_id, database, table) for table in tables]
+        return dict(zip(tables, await self.get_many(keys)))
+    
+    async def set_user_permissions_many(
+        self, user_id: int, database: str, permissions: dict[str, dict[str, Any]]
+    ) -> None:
+        """
+        Cache user permissions for several tables in one round-trip.
+        
+        Args:
+            user_id: User ID
+            database: Database name
+            permissions: Mapping of table name to permissions
+        """
+        await self.set_many(
+            {
+                self._generate_permission_key(user_id, database, table): table_permissions
+                for table, table_permissions in permissions.items()
+            },
+            expire=self.USER_PERM_TTL,
+        )
+    
+    async def get_popular_queries(
+        self, days: int, limit: int
+    ) -> Optional[list[dict[str, Any]]]:
+        """
+        Get the cached popular queries aggregate.
+        
+        Args:
+            days: Look back period in days
+            limit: Maximum number of queries
+        
+        Returns:
+            Popular queries or None if not cached
+        """
+        cached = await self.get(self._generate_popular_queries_key(days, limit))
+        return cached["queries"] if cached else None
+    
+    async def set_popular_queries(
+        self, days: int, limit: int, queries: list[dict[str, Any]]
+    ) -> None:
+        """
+        Cache the popular queries aggregate.
+        
+        Args:
+            days: Look back period in days
+            limit: Maximum number of queries
+            queries: Popular queries to cache
+        """
+        await self.set(
+            self._generate_popular_queries_key(days, limit),
+            {"queries": queries},
+            expire=self.POPULAR_QUERIES_TTL,
+        )
+    
+    async def _delete_matching(self, pattern: str, batch_size: int = 500) -> None:
+        """Delete keys matching a pattern, one DEL per batch of scanned keys."""
+        batch = []
+        async for key in self.client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                await self.client.delete(*batch)
+                batch = []
+        if batch:
+            await self.client.delete(*batch)
+    
+    async def get_history_entry(
+        self, user_id: int, query_id: int
+    ) -> Optional[dict[str, Any]]:
+        """
+        Get a cached query history record.
+        
+        Args:
+            user_id: User ID the record belongs to
+            query_id: Query history ID
+        
+        Returns:
+            History record or None if not cached
+        """
+        return await self.get(self._generate_history_entry_key(user_id, query_id))
+    
+    async def set_history_entry(
+        self, user_id: int, query_id: int, entry: dict[str, Any]
+    ) -> None:
+        """
+        Cache a query history record.
+        
+        Args:
+            user_id: User ID the record belongs to
+            query_id: Query history ID
+            entry: History record to cache
+        """
+        await self.set(
+            self._generate_history_entry_key(user_id, query_id),
+            entry,
+            expire=self.HISTORY_ENTRY_TTL,
+        )
+    
     async def invalidate_query_cache(self) -> None:
         """Invalidate all query result caches."""
-        pattern = f"{self.QUERY_RESULT_PREFIX}*"
-        async for key in self.client.scan_iter(match=pattern):
-            await self.client.delete(key)
+        await self._delete_matching(f"{self.QUERY_RESULT_PREFIX}*")
     
     async def invalidate_schema_cache(self, database: str, table: str) -> None:
         """Invalidate schema cache for specific table."""
@@ -271,9 +557,7 @@ class RedisCache:
     
     async def invalidate_user_permissions(self, user_id: int) -> None:
         """Invalidate all permissions for a user."""
-        pattern = f"{self.USER_PERM_PREFIX}{user_id}:*"
-        async for key in self.client.scan_iter(match=pattern):
-            await self.client.delete(key)
+        await self._delete_matching(f"{self.USER_PERM_PREFIX}{user_id}:*")
     
     async def check_rate_limit(self, user_id: int, limit: int) -> bool:
         """
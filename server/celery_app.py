@@ -57,6 +57,11 @@ celery_app.conf.update(
             "task": "server.scheduler.report_scheduler.cleanup_old_query_history",
             "schedule": crontab(hour=2, minute=0),  # Daily at 2 AM
         },
+        # Create upcoming monthly query history partitions (daily at 1 AM)
+        "ensure-history-partitions": {
+            "task": "server.scheduler.report_scheduler.ensure_query_history_partitions",
+            "schedule": crontab(hour=1, minute=0),  # Daily at 1 AM
+        },
     },
 )
 
@@ -4,6 +4,7 @@ from server.db.models import (
     Base,
     QueryHistory,
     QueryStatus,
+    QueryText,
     ReportFormat,
     RolePermission,
     SavedQuery,
@@ -19,6 +20,7 @@ __all__ = [
     "DatabaseConnectionModel",
     "QueryHistory",
     "QueryStatus",
+    "QueryText",
     "ReportFormat",
     "RolePermission",
     "SavedQuery",
@@ -36,8 +36,9 @@ class DatabaseConnection:
             pool_size=settings.database_pool_size,
             max_overflow=settings.database_max_overflow,
             pool_timeout=settings.database_pool_timeout,
-            pool_pre_ping=True,  # Verify connections before using
-            pool_recycle=3600,    # Recycle connections after 1 hour
+            # Recycling bounds connection age instead of a SELECT 1 per checkout
+            pool_pre_ping=settings.database_pool_pre_ping,
+            pool_recycle=settings.database_pool_recycle,
         )
         
         self._session_factory = async_sessionmaker(
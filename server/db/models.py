@@ -6,17 +6,23 @@ from enum import Enum as PyEnum
 from typing import Optional
 
 from sqlalchemy import (
+    DDL,
     JSON,
     Boolean,
+    CheckConstraint,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Identity,
     Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
+    event,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -79,28 +85,85 @@ class User(Base):
     permissions: Mapped[list["RolePermission"]] = relationship("RolePermission", back_populates="user")
 
 
+class QueryText(Base):
+    """Distinct (question, SQL) pairs referenced by query history."""
+    __tablename__ = "query_texts"
+    
+    # MD5 of question + NUL + generated_sql
+    fingerprint: Mapped[bytes] = mapped_column(LargeBinary(16), primary_key=True)
+    question: Mapped[str] = mapped_column(Text, nullable=False)
+    generated_sql: Mapped[str] = mapped_column(Text, nullable=False)
+
+
 class QueryHistory(Base):
-    """Tracks all executed queries for history and auditing."""
+    """
+    Tracks all executed queries for history and auditing.
+    
+    Range-partitioned by month on created_at, so date-bounded history reads
+    only scan the partitions in their window; created_at is therefore part of
+    the primary key.
+    """
     __tablename__ = "query_history"
     
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    question: Mapped[str] = mapped_column(Text, nullable=False)
-    generated_sql: Mapped[str] = mapped_column(Text, nullable=False)
+    # Question and SQL live in query_texts, stored once per distinct pair, so
+    # execution rows stay narrow for the statistics and popularity scans
+    query_fingerprint: Mapped[bytes] = mapped_column(
+        LargeBinary(16), ForeignKey("query_texts.fingerprint"), nullable=False, index=True
+    )
+    # Plain string (a QueryStatus value); the database enforces the allowed set
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
     result_rows: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     execution_time_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None), primary_key=True, index=True
+    )
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="query_history")
+    query_text: Mapped["QueryText"] = relationship("QueryText")
     
     __table_args__ = (
-        Index("idx_user_created", "user_id", "created_at"),
+        CheckConstraint(
+            "status IN ('pending', 'running', 'success', 'failed')",
+            name="ck_query_history_status",
+        ),
+        # Covers the per-user history list and statistics (index-only scans)
+        Index(
+            "idx_history_user_created",
+            "user_id",
+            text("created_at DESC"),
+            postgresql_include=["status", "execution_time_ms", "result_rows"],
+        ),
+        Index(
+            "idx_history_user_success",
+            "user_id",
+            text("created_at DESC"),
+            postgresql_where=text("status = 'success'"),
+        ),
+        # Popular queries scan successful queries across all users by date
+        Index(
+            "idx_history_success_created",
+            "created_at",
+            postgresql_where=text("status = 'success'"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
+# create_all only creates the partitioned parent; rows outside the monthly
+# partitions (see report_scheduler.ensure_query_history_partitions) land here
+event.listen(
+    QueryHistory.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS query_history_default PARTITION OF query_history DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
+
+
 class SavedQuery(Base):
     """User's saved/favorite queries."""
     __tablename__ = "saved_queries"
@@ -149,6 +212,7 @@ class ScheduledReport(Base):
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="scheduled_reports")
+    saved_query: Mapped["SavedQuery"] = relationship("SavedQuery")
 
 
 class RolePermission(Base):
@@ -3,7 +3,10 @@ FastMCP Server for Database Query Assistant.
 Exposes tools for natural language database querying.
 """
 import asyncio
+import traceback
+import uuid
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from typing import Any
 
 from dotenv import load_dotenv
@@ -30,6 +33,17 @@ from sqlalchemy import select, delete, text
 from shared.config import settings
 from croniter import croniter
 from datetime import datetime, UTC
+import csv
+
+# Resolve the email sender once at import time so trigger_report_now doesn't
+# re-run the import machinery on every call
+try:
+    from server.scheduler.email_sender import send_report_email, EMAIL_PREVIEW_ROWS
+    _EMAIL_IMPORT_ERR: Exception | None = None
+except Exception as e:
+    send_report_email = None
+    EMAIL_PREVIEW_ROWS = 10
+    _EMAIL_IMPORT_ERR = e
 
 from dotenv import load_dotenv
 
@@ -88,7 +102,9 @@ async def get_db_session():
 
 
 @mcp.tool()
-async def query_database(question: str, user_id: int) -> dict[str, Any]:
+async def query_database(
+    question: str, user_id: int, row_format: str = "records"
+) -> dict[str, Any]:
     """
     Query the database using natural language.
     
@@ -99,6 +115,8 @@ async def query_database(question: str, user_id: int) -> dict[str, Any]:
     Args:
         question: Natural language question (e.g., "What are the top 5 customers by revenue?")
         user_id: ID of the user executing the query
+        row_format: "records" (list of dicts) or "columnar" (lists of values
+            ordered like "columns")
     
     Returns:
         Dictionary containing:
@@ -140,6 +158,7 @@ async def query_database(question: str, user_id: int) -> dict[str, Any]:
                 user_id=user_id,
                 session=session,
                 cache_results=True,
+                row_format=row_format,
             )
             
             # 4. Log query to history
@@ -469,7 +488,6 @@ async def save_query(
         except Exception as e:
             await session.rollback()
             print(f"❌ Failed to save query: {e}")
-            import traceback
             traceback.print_exc()
             return {
                 "error": f"Failed to save query: {str(e)}",
@@ -1069,32 +1087,38 @@ async def list_scheduled_reports(user_id: int) -> dict[str, Any]:
     """
     async with get_db_session() as session:
         try:
+            # Select plain columns (Core rows) to skip ORM entity construction
             stmt = (
-                select(ScheduledReport)
+                select(
+                    ScheduledReport.id,
+                    ScheduledReport.name,
+                    ScheduledReport.description,
+                    ScheduledReport.saved_query_id,
+                    ScheduledReport.schedule_cron,
+                    ScheduledReport.format,
+                    ScheduledReport.recipients,
+                    ScheduledReport.is_active,
+                    ScheduledReport.last_run_at,
+                    ScheduledReport.next_run_at,
+                    ScheduledReport.status,
+                    ScheduledReport.created_at,
+                )
                 .where(ScheduledReport.user_id == user_id)
                 .order_by(ScheduledReport.created_at.desc())
             )
             result = await session.execute(stmt)
-            reports = result.scalars().all()
+            reports = []
+            for r in result.mappings():
+                report = dict(r)
+                report["format"] = r["format"].value
+                report["status"] = r["status"].value
+                report["last_run_at"] = r["last_run_at"].isoformat() if r["last_run_at"] else None
+                report["next_run_at"] = r["next_run_at"].isoformat() if r["next_run_at"] else None
+                report["created_at"] = r["created_at"].isoformat()
+                reports.append(report)
             
             return {
-                "reports": [
-                    {
-                        "id": r.id,
-                        "name": r.name,
-                        "description": r.description,
-                        "saved_query_id": r.saved_query_id,
-                        "schedule_cron": r.schedule_cron,
-                        "format": r.format.value,
-                        "recipients": r.recipients,
-                        "is_active": r.is_active,
-                        "last_run_at": r.last_run_at.isoformat() if r.last_run_at else None,
-                        "next_run_at": r.next_run_at.isoformat() if r.next_run_at else None,
-                        "status": r.status.value,
-                        "created_at": r.created_at.isoformat(),
-                    }
-                    for r in reports
-                ],
+                "reports": reports,
                 "total": len(reports),
                 "status": "success",
             }
@@ -1246,23 +1270,177 @@ async def delete_scheduled_report(report_id: int, user_id: int) -> dict[str, Any
             }
 
 
+@dataclass
+class ReportJob:
+    """A manual report run waiting in the in-process report queue."""
+    job_id: str
+    report_id: int
+    user_id: int
+
+
+# In-process queue for manually triggered reports. The MCP tool only enqueues;
+# a background worker runs the SQL, writes the attachment and sends emails.
+_REPORT_QUEUE: asyncio.Queue[ReportJob] = asyncio.Queue(maxsize=128)
+# Bound concurrent report runs so they don't exhaust the DB connection pool
+_REPORT_SEMAPHORE = asyncio.Semaphore(2)
+_REPORT_JOBS: dict[str, dict[str, Any]] = {}
+_MAX_TRACKED_JOBS = 512
+_REPORT_CSV_CHUNK_ROWS = 4096
+_report_worker_task: asyncio.Task | None = None
+# The loop only keeps weak references to tasks, so in-flight report runs are
+# held here until they finish (otherwise they could be garbage-collected)
+_REPORT_TASKS: set[asyncio.Task] = set()
+
+
+def _write_report_csv(path: str, columns: list[str], rows: list[dict[str, Any]]) -> None:
+    """Stream result rows straight into a CSV file, one batch of rows per write."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for start in range(0, len(rows), _REPORT_CSV_CHUNK_ROWS):
+            writer.writerows(rows[start:start + _REPORT_CSV_CHUNK_ROWS])
+
+
+async def _report_worker() -> None:
+    """Consume queued report jobs and record their results."""
+    while True:
+        job = await _REPORT_QUEUE.get()
+        await _REPORT_SEMAPHORE.acquire()
+        task = asyncio.create_task(_process_report_job(job))
+        _REPORT_TASKS.add(task)
+        task.add_done_callback(_REPORT_TASKS.discard)
+        task.add_done_callback(lambda _: _REPORT_SEMAPHORE.release())
+        task.add_done_callback(lambda _: _REPORT_QUEUE.task_done())
+
+
+async def _process_report_job(job: ReportJob) -> None:
+    """Run a single queued report job and store its outcome."""
+    # Entries are only evicted once finished, but don't let a missing one
+    # kill the task after the report has already run
+    entry = _REPORT_JOBS.get(job.job_id)
+    if entry is not None:
+        entry["status"] = "running"
+    try:
+        result = await _run_report(job.report_id, job.user_id)
+    except Exception as e:
+        result = {
+            "error": f"Failed to execute report: {str(e)}",
+            "status": "error",
+        }
+    entry = _REPORT_JOBS.get(job.job_id)
+    if entry is None:
+        return
+    entry.update(
+        result=result,
+        status="completed" if result.get("status") != "error" else "failed",
+        finished_at=datetime.now(UTC).replace(tzinfo=None).isoformat(),
+    )
+
+
+def _evict_finished_report_jobs() -> None:
+    """Forget the oldest finished jobs so the status table stays below its cap."""
+    excess = len(_REPORT_JOBS) - _MAX_TRACKED_JOBS + 1
+    if excess <= 0:
+        return
+    # Queued and running jobs are kept so their outcome can still be recorded
+    finished = [
+        job_id for job_id, entry in _REPORT_JOBS.items()
+        if entry["status"] in ("completed", "failed")
+    ]
+    for job_id in finished[:excess]:
+        del _REPORT_JOBS[job_id]
+
+
+def _ensure_report_worker() -> None:
+    """Start the report worker on the running event loop if it isn't alive."""
+    global _report_worker_task
+    if _report_worker_task is None or _report_worker_task.done():
+        _report_worker_task = asyncio.create_task(_report_worker())
+
+
 @mcp.tool()
 async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
     """
     Trigger a scheduled report to run immediately.
     
+    The report is queued and executed in the background; use
+    get_report_status with the returned job_id to follow its progress.
+    
     Args:
         report_id: Report ID
         user_id: User ID
     
     Returns:
-        Dictionary with execution status
+        Dictionary with the queued job ID and status
     
     Example:
-        >>> result = await trigger_report_now(report_id=5, user_id=1)
-        >>> print(f"Report executed: {result['status']}")
+        >>> job = await trigger_report_now(report_id=5, user_id=1)
+        >>> result = await get_report_status(job_id=job['job_id'])
+        >>> print(f"Report status: {result['status']}")
     """
-    print(f"🔥 TRIGGER_REPORT_NOW CALLED: report_id={report_id}, user_id={user_id}")
+    _ensure_report_worker()
+    
+    job = ReportJob(job_id=uuid.uuid4().hex, report_id=report_id, user_id=user_id)
+    try:
+        _REPORT_QUEUE.put_nowait(job)
+    except asyncio.QueueFull:
+        return {
+            "error": "Report queue is full, try again later",
+            "status": "error",
+        }
+    
+    _evict_finished_report_jobs()
+    
+    _REPORT_JOBS[job.job_id] = {
+        "job_id": job.job_id,
+        "report_id": report_id,
+        "user_id": user_id,
+        "status": "queued",
+        "queued_at": datetime.now(UTC).replace(tzinfo=None).isoformat(),
+        "result": None,
+    }
+    
+    return {
+        "job_id": job.job_id,
+        "report_id": report_id,
+        "status": "queued",
+        "message": "Report queued for execution",
+    }
+
+
+@mcp.tool()
+async def get_report_status(job_id: str, user_id: int) -> dict[str, Any]:
+    """
+    Get the status of a report run queued with trigger_report_now.
+    
+    Args:
+        job_id: Job ID returned by trigger_report_now
+        user_id: User ID that queued the job
+    
+    Returns:
+        Dictionary containing:
+        - job_id: ID of the job
+        - report_id: ID of the report being run
+        - status: queued, running, completed, or failed
+        - result: Execution details once the job has finished
+    
+    Example:
+        >>> status = await get_report_status(job_id="3f2a...", user_id=1)
+        >>> print(status['status'])
+    """
+    job = _REPORT_JOBS.get(job_id)
+    if not job or job["user_id"] != user_id:
+        return {
+            "error": "Job not found or access denied",
+            "status": "not_found",
+        }
+    
+    return dict(job)
+
+
+async def _run_report(report_id: int, user_id: int) -> dict[str, Any]:
+    """Execute a report, email it to its recipients and update last_run_at."""
+    print(f"🔥 RUNNING REPORT: report_id={report_id}, user_id={user_id}")
     
     async with get_db_session() as session:
         try:
@@ -1299,7 +1477,6 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                 }
             
             # Execute the query using the global executor instance
-            from server.query.query_executor import query_executor
             # Use the generated SQL from the saved query
             query_result = await query_executor.execute_query(
                 saved_query.generated_sql, 
@@ -1310,16 +1487,9 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
             # Generate report file and send emails
             try:
                 print(f"DEBUG: Starting email generation for report {report_id}")
-                import pandas as pd
-                import os
-                from datetime import datetime
                 
-                # Import email sender with error handling
-                try:
-                    from server.scheduler.email_sender import send_report_email
-                    print("DEBUG: Email sender imported successfully")
-                except Exception as import_error:
-                    print(f"DEBUG: Failed to import email sender: {import_error}")
+                if send_report_email is None:
+                    print(f"DEBUG: Email sender unavailable: {_EMAIL_IMPORT_ERR}")
                     # Fallback - just update the report without sending email
                     report.last_run_at = datetime.now(UTC).replace(tzinfo=None)
                     await session.commit()
@@ -1329,14 +1499,13 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                         "message": f"Report executed but email disabled due to import error. Retrieved {query_result.get('row_count', 0)} rows.",
                         "execution_time": query_result.get("execution_time_ms"),
                         "row_count": query_result.get("row_count"),
-                        "email_status": f"❌ Email disabled: {str(import_error)}",
+                        "email_status": f"❌ Email disabled: {str(_EMAIL_IMPORT_ERR)}",
                         "recipients_count": len(report.recipients)
                     }
                 
-                # Convert query results to DataFrame
-                df = pd.DataFrame(query_result.get("rows", []))
+                rows = query_result.get("rows", [])
                 
-                if df.empty:
+                if not rows:
                     return {
                         "error": "Query returned no data to report",
                         "status": "error",
@@ -1351,8 +1520,9 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                 report_filename = f"report_{report_id}_{timestamp}.csv"
                 report_path = os.path.join(reports_dir, report_filename)
                 
-                # Save as CSV
-                df.to_csv(report_path, index=False)
+                # Save as CSV off the event loop, writing rows directly (no DataFrame copy)
+                columns = query_result.get("columns") or list(rows[0].keys())
+                await asyncio.to_thread(_write_report_csv, report_path, columns, rows)
                 
                 # Send email to all recipients
                 email_sent_count = 0
@@ -1361,7 +1531,6 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                 # Send email with the correct function signature
                 try:
                     # Debug: Check email settings
-                    from shared.config import settings
                     print(f"DEBUG: Email settings - HOST: {settings.email_smtp_host}, USER: {settings.email_username}, FROM_NAME: {getattr(settings, 'email_from_name', None)}")
                     
                     email_result = await send_report_email(
@@ -1369,7 +1538,8 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                         subject=f"Scheduled Report: {report.name}",
                         report_name=report.name,
                         description=report.description or "Scheduled Report",
-                        data=query_result.get("rows", []),
+                        data=rows[:EMAIL_PREVIEW_ROWS],
+                        row_count=len(rows),
                         attachment_path=report_path,
                         format="csv"
                     )
@@ -1384,7 +1554,6 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
                 except Exception as email_error:
                     email_errors.append(f"Failed to send emails: {str(email_error)}")
                     print(f"DEBUG: Email exception: {email_error}")
-                    import traceback
                     print(f"DEBUG: Full traceback: {traceback.format_exc()}")
                 
                 # Update last run time
@@ -1435,7 +1604,6 @@ async def trigger_report_now(report_id: int, user_id: int) -> dict[str, Any]:
             
         except Exception as e:
             await session.rollback()
-            import traceback
             error_details = traceback.format_exc()
             print(f"Report execution error: {error_details}")  # For debugging
             return {
@@ -1454,6 +1622,10 @@ if __name__ == "__main__":
     # This avoids event loop conflicts with FastMCP's event loop
     print("✅ Database will initialize on first query")
     
+    # Use uvloop for the server's event loop when available
+    from shared.event_loop import install_event_loop_policy
+    print(f"✅ Event loop: {install_event_loop_policy()}")
+    
     # Run the MCP server (stdio transport by default)
     print(f"✅ Starting MCP Server on stdio transport")
     mcp.run()
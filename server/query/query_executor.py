@@ -2,19 +2,90 @@
 Query executor with timeout, pagination, and error handling.
 """
 import asyncio
-from datetime import datetime, UTC
+import re
+import time
+from datetime import date, time as dt_time
 from decimal import Decimal
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Optional
 
+import sqlparse
+from sqlparse.tokens import Keyword
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.auth import rbac, validator, QueryValidationError
 from server.cache import cache
-from server.db.models import QueryHistory, QueryStatus
+from server.db.models import QueryStatus
+from server.tools.history import history_writer
 from shared.config import settings
 
 
+# PostgreSQL type OIDs (cursor.description type codes) that need converting
+# to JSON-serializable values: date, time, timestamp, timestamptz, timetz
+_ISOFORMAT_TYPE_OIDS = frozenset({1082, 1083, 1114, 1184, 1266})
+_NUMERIC_TYPE_OID = 1700
+
+# Functions whose value changes between executions (current time, random)
+_VOLATILE_SQL_RE = re.compile(
+    r"\b(?:NOW\s*\(|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP"
+    r"|CLOCK_TIMESTAMP|STATEMENT_TIMESTAMP|TRANSACTION_TIMESTAMP|TIMEOFDAY"
+    r"|RANDOM\s*\(|GEN_RANDOM_UUID|UUID_GENERATE_\w+)",
+    re.IGNORECASE,
+)
+
+# Rows fetched per round-trip when streaming results from a server-side cursor
+STREAM_BATCH_ROWS = 1000
+
+# Supported result row layouts: list of dicts, or value lists + "columns"
+ROW_FORMATS = ("records", "columnar")
+
+
+def _isoformat(value: Any) -> Any:
+    """Convert a date/time value to an ISO string, keeping NULLs."""
+    return value.isoformat() if value is not None else None
+
+
+def _to_float(value: Any) -> Any:
+    """Convert a NUMERIC value to float, keeping NULLs."""
+    return float(value) if value is not None else None
+
+
+def _convert_value(value: Any) -> Any:
+    """Convert a value of unknown column type to a JSON-serializable one."""
+    if isinstance(value, (date, dt_time)):  # datetime is a date subclass
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+@lru_cache(maxsize=1024)
+def _with_limit(sql: str, max_rows: int) -> str:
+    """
+    Append a LIMIT clause unless the statement already has a top-level one.
+    
+    Parsed rather than substring-matched, so "LIMIT" inside string literals,
+    identifiers or subqueries doesn't suppress the outer limit.
+    """
+    statement = sqlparse.parse(sql)[0]
+    if any(tok.ttype is Keyword and tok.normalized == "LIMIT" for tok in statement.tokens):
+        return sql
+    return f"{sql.rstrip().rstrip(';')} LIMIT {max_rows}"
+
+
+def _converter_for(type_code: Any) -> Optional[Callable[[Any], Any]]:
+    """Pick the value converter for a column from its driver type code."""
+    if type_code in _ISOFORMAT_TYPE_OIDS:
+        return _isoformat
+    if type_code == _NUMERIC_TYPE_OID:
+        return _to_float
+    if isinstance(type_code, int):
+        return None
+    # Driver didn't report a PostgreSQL type; inspect each value instead
+    return _convert_value
+
+
 class QueryExecutor:
     """Executes SQL queries with safety controls and logging."""
     
@@ -25,6 +96,7 @@ class QueryExecutor:
         session: AsyncSession,
         params: Optional[dict] = None,
         cache_results: bool = True,
+        row_format: str = "records",
     ) -> dict[str, Any]:
         """
         Execute SQL query with timeout and safety checks.
@@ -35,6 +107,8 @@ class QueryExecutor:
             session: Database session
             params: Query parameters (optional)
             cache_results: Whether to cache results (default: True)
+            row_format: "records" for a list of dicts per row, or "columnar"
+                for lists of values ordered like "columns" (no repeated keys)
         
         Returns:
             Dictionary with results, metadata, and execution stats
@@ -43,52 +117,38 @@ class QueryExecutor:
             QueryValidationError: If query is invalid or unsafe
             PermissionError: If user lacks permission
             TimeoutError: If query exceeds timeout
+            ValueError: If row_format is not supported
         """
-        start_time = datetime.now(UTC)
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f"Unsupported row format: {row_format}")
         
-        # 1. Validate SQL
-        is_valid, error_msg = validator.validate_query(sql, allow_write=False)
-        if not is_valid:
-            await self._log_query_failure(
-                session, user_id, sql, f"Validation failed: {error_msg}"
-            )
-            raise QueryValidationError(error_msg)
+        start_ns = time.perf_counter_ns()
+        requested_sql = sql
         
-        # 2. Extract tables from query
-        tables = validator.extract_tables_from_query(sql)
-        if not tables:
-            raise QueryValidationError("Could not determine tables from query")
+        # Results of queries using volatile functions change on every run, so
+        # don't spend Redis round-trips caching them
+        if cache_results and _VOLATILE_SQL_RE.search(sql):
+            cache_results = False
         
-        # 3. Check permissions for all tables
-        for table in tables:
-            has_access, permissions = await rbac.check_table_access(
-                user_id, "public", table, session
-            )
-            if not has_access:
-                await self._log_query_failure(
-                    session, user_id, sql, f"Access denied to table: {table}"
-                )
-                raise PermissionError(f"Access denied to table: {table}")
-            
-            # Apply row-level security if needed
-            if permissions and permissions.get("row_filter"):
-                sql = await rbac.apply_row_level_security(
-                    user_id, "public", table, sql, session
-                )
-        
-        # 4. Check cache first
+        # 1. Check cache first - entries are only stored after validation and
+        # RBAC passed, and are dropped when the user's permissions change
         if cache_results:
-            cached_result = await cache.get_query_result(sql, params)
-            if cached_result is not None:
+            cached_entry = await cache.get_user_query_result(sql, user_id, params)
+            if cached_entry is not None and "columns" in cached_entry:
+                columns = cached_entry["columns"]
+                values = cached_entry["rows"]
                 return {
-                    "rows": cached_result,
-                    "row_count": len(cached_result),
-                    "columns": list(cached_result[0].keys()) if cached_result else [],
+                    "rows": self._format_rows(columns, values, row_format),
+                    "row_count": len(values),
+                    "columns": columns,
                     "execution_time_ms": 0,
                     "cached": True,
-                    "sql": sql,
+                    "sql": cached_entry["sql"],
                 }
         
+        # 2-4. Validate, check table permissions and apply row-level security
+        sql = await self._authorize_query(sql, user_id, session)
+        
         # 5. Execute query with timeout
         try:
             result = await asyncio.wait_for(
@@ -106,41 +166,187 @@ class QueryExecutor:
             await self._log_query_failure(session, user_id, sql, str(e))
             raise
         
-        # 6. Convert to list of dicts
-        rows = []
-        columns = result.keys() if result.rowcount > 0 else []
-        
-        for row in result.fetchall():
-            row_dict = dict(zip(columns, row))
-            # Convert non-serializable types
-            for key, value in row_dict.items():
-                if isinstance(value, datetime):
-                    row_dict[key] = value.isoformat()
-                elif isinstance(value, Decimal):
-                    row_dict[key] = float(value)
-            rows.append(row_dict)
+        # 6. Convert to JSON-serializable row values in a single pass over the result
+        columns = list(result.keys())
+        values = self._build_rows(result, columns)
         
         # 7. Calculate execution time
-        execution_time = (datetime.now(UTC) - start_time).total_seconds() * 1000
+        execution_time = (time.perf_counter_ns() - start_ns) / 1e6
         
-        # 8. Cache results
-        if cache_results and rows:
-            await cache.set_query_result(sql, rows, params)
+        # 8. Cache results - columns are stored with the rows, so empty
+        # results can be cached too
+        if cache_results:
+            await cache.set_user_query_result(
+                requested_sql, user_id, sql, columns, values, params
+            )
         
         # 9. Log successful query
         await self._log_query_success(
-            session, user_id, sql, len(rows), execution_time
+            session, user_id, sql, len(values), execution_time
         )
         
         return {
-            "rows": rows,
-            "row_count": len(rows),
-            "columns": list(columns),
+            "rows": self._format_rows(columns, values, row_format),
+            "row_count": len(values),
+            "columns": columns,
             "execution_time_ms": round(execution_time, 2),
             "cached": False,
             "sql": sql,
         }
     
+    async def stream_query(
+        self,
+        sql: str,
+        user_id: int,
+        session: AsyncSession,
+        params: Optional[dict] = None,
+        batch_size: int = STREAM_BATCH_ROWS,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Execute a SQL query and yield its rows in batches from a server-side cursor.
+        
+        Applies the same validation, permission checks and row limit as
+        execute_query, but never holds more than one batch in memory.
+        Results are not cached.
+        
+        Args:
+            sql: SQL query to execute
+            user_id: User ID executing the query
+            session: Database session
+            params: Query parameters (optional)
+            batch_size: Number of rows fetched and yielded at a time
+        
+        Yields:
+            Lists of up to batch_size row dicts
+        
+        Raises:
+            QueryValidationError: If query is invalid or unsafe
+            PermissionError: If user lacks permission
+            TimeoutError: If query exceeds timeout
+        """
+        start_ns = time.perf_counter_ns()
+        sql = await self._authorize_query(sql, user_id, session)
+        statement = text(_with_limit(sql, settings.max_query_results)).execution_options(
+            yield_per=batch_size
+        )
+        
+        try:
+            result = await asyncio.wait_for(
+                session.stream(statement, params or {}),
+                timeout=settings.query_timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            await self._log_query_failure(
+                session, user_id, sql, "Query timeout exceeded"
+            )
+            raise TimeoutError(
+                f"Query exceeded timeout of {settings.query_timeout_seconds} seconds"
+            )
+        except Exception as e:
+            await self._log_query_failure(session, user_id, sql, str(e))
+            raise
+        
+        columns = list(result.keys())
+        conversions = self._row_conversions(result, columns)
+        row_count = 0
+        async for partition in result.partitions(batch_size):
+            values = self._convert_rows(partition, conversions)
+            row_count += len(values)
+            yield self._format_rows(columns, values, "records")
+        
+        execution_time = (time.perf_counter_ns() - start_ns) / 1e6
+        await self._log_query_success(
+            session, user_id, sql, row_count, execution_time
+        )
+    
+    async def _authorize_query(
+        self,
+        sql: str,
+        user_id: int,
+        session: AsyncSession,
+    ) -> str:
+        """
+        Validate a query and check the user's access to every table it reads.
+        
+        Returns:
+            SQL with row-level security filters applied
+        
+        Raises:
+            QueryValidationError: If query is invalid or unsafe
+            PermissionError: If user lacks permission
+        """
+        # Validate SQL
+        is_valid, error_msg = validator.validate_query(sql, allow_write=False)
+        if not is_valid:
+            await self._log_query_failure(
+                session, user_id, sql, f"Validation failed: {error_msg}"
+            )
+            raise QueryValidationError(error_msg)
+        
+        # Extract tables from query
+        tables = validator.extract_tables_from_query(sql)
+        if not tables:
+            raise QueryValidationError("Could not determine tables from query")
+        
+        # Check permissions for all tables in one batch
+        table_access = await rbac.check_tables_access(
+            user_id, "public", tables, session
+        )
+        for table in tables:
+            permissions = table_access.get(table)
+            if permissions is None:
+                await self._log_query_failure(
+                    session, user_id, sql, f"Access denied to table: {table}"
+                )
+                raise PermissionError(f"Access denied to table: {table}")
+            
+            # Apply row-level security if needed
+            if permissions.get("row_filter"):
+                sql = rbac.add_row_filter(sql, permissions["row_filter"])
+        
+        return sql
+    
+    @staticmethod
+    def _build_rows(result, columns: list[str]) -> list[list[Any]]:
+        """Build row value lists, converting non-serializable types per column."""
+        conversions = QueryExecutor._row_conversions(result, columns)
+        return QueryExecutor._convert_rows(result, conversions)
+    
+    @staticmethod
+    def _row_conversions(result, columns: list[str]) -> list[tuple[int, Callable[[Any], Any]]]:
+        """Pick (column index, converter) pairs for columns that need converting."""
+        # session.stream() returns an AsyncResult wrapping the CursorResult
+        cursor_result = getattr(result, "_real_result", result)
+        description = getattr(getattr(cursor_result, "cursor", None), "description", None)
+        if description:
+            converters = [_converter_for(col[1]) for col in description]
+        else:
+            converters = [_convert_value] * len(columns)
+        return [(i, conv) for i, conv in enumerate(converters) if conv]
+    
+    @staticmethod
+    def _convert_rows(rows, conversions: list[tuple[int, Callable[[Any], Any]]]) -> list[list[Any]]:
+        """Convert rows to value lists; only columns that need it are touched per row."""
+        if not conversions:
+            return [list(row) for row in rows]
+        
+        converted = []
+        for row in rows:
+            values = list(row)
+            for i, conv in conversions:
+                values[i] = conv(values[i])
+            converted.append(values)
+        return converted
+    
+    @staticmethod
+    def _format_rows(
+        columns: list[str], values: list[list[Any]], row_format: str
+    ) -> list[Any]:
+        """Shape row values for the response; columnar rows are returned as-is."""
+        if row_format == "columnar":
+            return values
+        return [dict(zip(columns, row)) for row in values]
+    
     async def _execute_with_limit(
         self,
         session: AsyncSession,
@@ -149,9 +355,7 @@ class QueryExecutor:
     ):
         """Execute query with result limit."""
         # Add LIMIT if not present
-        sql_upper = sql.upper()
-        if "LIMIT" not in sql_upper:
-            sql = f"{sql.rstrip(';')} LIMIT {settings.max_query_results}"
+        sql = _with_limit(sql, settings.max_query_results)
         
         # Execute query
         if params:
@@ -169,17 +373,16 @@ class QueryExecutor:
         row_count: int,
         execution_time_ms: float,
     ) -> None:
-        """Log successful query execution."""
-        history = QueryHistory(
-            user_id=user_id,
-            question="",  # Will be filled by MCP server
-            generated_sql=sql,
-            status=QueryStatus.SUCCESS,
-            result_rows=row_count,
-            execution_time_ms=execution_time_ms,
-        )
-        session.add(history)
-        await session.commit()
+        """Log successful query execution (written in the background)."""
+        history_writer.enqueue(session.bind, {
+            "user_id": user_id,
+            "question": "",  # Will be filled by MCP server
+            "generated_sql": sql,
+            "status": QueryStatus.SUCCESS,
+            "result_rows": row_count,
+            "execution_time_ms": execution_time_ms,
+            "error_message": None,
+        })
     
     async def _log_query_failure(
         self,
@@ -188,16 +391,16 @@ class QueryExecutor:
         sql: str,
         error_message: str,
     ) -> None:
-        """Log failed query execution."""
-        history = QueryHistory(
-            user_id=user_id,
-            question="",
-            generated_sql=sql,
-            status=QueryStatus.FAILED,
-            error_message=error_message,
-        )
-        session.add(history)
-        await session.commit()
+        """Log failed query execution (written in the background)."""
+        history_writer.enqueue(session.bind, {
+            "user_id": user_id,
+            "question": "",
+            "generated_sql": sql,
+            "status": QueryStatus.FAILED,
+            "result_rows": None,
+            "execution_time_ms": None,
+            "error_message": error_message,
+        })
     
     async def explain_query(
         self,
@@ -3,9 +3,10 @@ SQL generation engine using Pydantic AI Agent with Groq.
 Converts natural language questions to safe SQL queries.
 """
 import hashlib
+from collections import defaultdict
 from typing import Optional
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
 from pydantic_ai import Agent, RunContext
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -15,6 +16,74 @@ from server.cache import cache
 from shared.config import settings
 
 
+# Byte table for ASCII lowercasing when normalizing cached questions
+_ASCII_LOWER = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz"
+)
+
+# Internal MCP tables left out of the LLM prompt
+_INTERNAL_TABLES = frozenset({
+    "users",
+    "query_history",
+    "query_texts",
+    "saved_queries",
+    "scheduled_reports",
+    "role_permissions",
+    "database_connections",
+})
+
+# Partitions of query_history (monthly query_history_pYYYY_MM and the
+# default partition) are internal too
+_INTERNAL_TABLE_PREFIX = "query_history_"
+
+
+def _is_internal_table(table: str) -> bool:
+    """Whether a table belongs to the MCP server rather than the business schema."""
+    return table in _INTERNAL_TABLES or table.startswith(_INTERNAL_TABLE_PREFIX)
+
+
+# Schema introspection statement, built once so SQLAlchemy can reuse its
+# compiled form across calls. Returns every column in the schema together
+# with the foreign key it references (if any), so tables, columns and
+# relationships all come back in a single round-trip. Partitions are skipped;
+# only their parent table is queried.
+_SCHEMA_Q = text("""
+    SELECT
+        c.table_name,
+        c.column_name,
+        c.data_type,
+        fk.foreign_table_name,
+        fk.foreign_column_name
+    FROM information_schema.columns AS c
+    JOIN pg_catalog.pg_namespace AS ns
+        ON ns.nspname = c.table_schema
+    JOIN pg_catalog.pg_class AS pc
+        ON pc.relnamespace = ns.oid
+        AND pc.relname = c.table_name
+    LEFT JOIN (
+        SELECT
+            kcu.table_name,
+            kcu.column_name,
+            ccu.table_name AS foreign_table_name,
+            ccu.column_name AS foreign_column_name
+        FROM information_schema.table_constraints AS tc
+        JOIN information_schema.key_column_usage AS kcu
+            ON tc.constraint_name = kcu.constraint_name
+            AND tc.table_schema = kcu.table_schema
+        JOIN information_schema.constraint_column_usage AS ccu
+            ON ccu.constraint_name = tc.constraint_name
+            AND ccu.table_schema = tc.table_schema
+        WHERE tc.constraint_type = 'FOREIGN KEY'
+            AND tc.table_schema = :schema
+    ) AS fk
+        ON fk.table_name = c.table_name
+        AND fk.column_name = c.column_name
+    WHERE c.table_schema = :schema
+        AND NOT pc.relispartition
+    ORDER BY c.table_name, c.ordinal_position, fk.foreign_table_name
+""")
+
+
 class SQLGenerationResult(BaseModel):
     """Result from SQL generation."""
     model_config = ConfigDict(extra='ignore')  # Ignore extra fields from LLM
@@ -31,6 +100,18 @@ class SchemaContext(BaseModel):
     table_schemas: dict[str, list[str]]  # table_name -> column_names
     table_relationships: Optional[dict[str, list[str]]] = None  # table -> foreign keys info
     sample_data: Optional[dict[str, list[dict]]] = None
+    column_names: Optional[dict[str, list[str]]] = None  # table_name -> bare column names
+    _tables_hash: Optional[str] = PrivateAttr(default=None)
+    
+    @property
+    def tables_hash(self) -> str:
+        """Short digest of the table list, computed once per schema context."""
+        if self._tables_hash is None:
+            self._tables_hash = hashlib.blake2b(
+                "".join(sorted(self.available_tables)).encode(),
+                digest_size=4,
+            ).hexdigest()
+        return self._tables_hash
 
 
 class SQLGenerator:
@@ -186,17 +267,17 @@ class SQLGenerator:
     @staticmethod
     def _get_query_cache_key(question: str, schema_context: SchemaContext) -> str:
         """Generate cache key for SQL generation."""
-        # Normalize question - lowercase and strip whitespace
-        normalized_question = question.lower().strip()
+        # Normalize question - ASCII lowercase and strip whitespace on the
+        # encoded bytes, in place of str.lower().strip()
+        normalized_question = question.encode().translate(_ASCII_LOWER).strip()
         
-        # Create a hash of tables to detect schema changes
-        tables_hash = hashlib.md5(
-            "".join(sorted(schema_context.available_tables)).encode()
-        ).hexdigest()[:8]
-        
-        # Create cache key
-        question_hash = hashlib.md5(normalized_question.encode()).hexdigest()[:16]
-        return f"sql_gen:{tables_hash}:{question_hash}"
+        # Keying the digest with the tables hash ties entries to the schema
+        question_hash = hashlib.blake2b(
+            normalized_question,
+            key=schema_context.tables_hash.encode(),
+            digest_size=12,
+        ).hexdigest()
+        return f"sql_gen:{question_hash}"
     
     @staticmethod
     def _build_context_message(schema_context: SchemaContext) -> str:
@@ -205,15 +286,15 @@ class SQLGenerator:
         
         # Only include business tables (skip internal MCP tables for speed)
         business_tables = [t for t in schema_context.available_tables 
-                          if t not in ['users', 'query_history', 'saved_queries', 
-                                      'scheduled_reports', 'role_permissions', 
-                                      'database_connections']]
+                          if not _is_internal_table(t)]
         
-        # Add tables and columns in compact format
+        # Add tables and columns in compact format (names only, no types)
+        column_names = schema_context.column_names
         for table in business_tables:
-            columns = schema_context.table_schemas.get(table, [])
-            # Shorten column info - just names without types for common cases
-            col_names = [c.split(' (')[0] for c in columns]
+            if column_names is not None:
+                col_names = column_names.get(table, [])
+            else:
+                col_names = [c.split(' (')[0] for c in schema_context.table_schemas.get(table, [])]
             context_parts.append(f"{table}: {', '.join(col_names)}")
         
         # Add table relationships in compact format
@@ -249,71 +330,32 @@ class SQLGenerator:
         if cached_schema:
             return SchemaContext(**cached_schema)
         
-        # Query information_schema for tables
-        tables_query = text("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = :schema
-            ORDER BY table_name
-        """)
-        
-        result = await session.execute(tables_query, {"schema": database_name})
-        available_tables = [row[0] for row in result.fetchall()]
+        # Fetch tables, columns and foreign keys in one query and group by table
+        table_schemas: dict[str, list[str]] = defaultdict(list)
+        column_names: dict[str, list[str]] = defaultdict(list)
+        table_relationships: dict[str, list[str]] = defaultdict(list)
+        last_column = None
         
-        # Get columns for each table
-        table_schemas = {}
-        for table in available_tables:
-            columns_query = text("""
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_schema = :schema AND table_name = :table
-                ORDER BY ordinal_position
-            """)
+        result = await session.execute(_SCHEMA_Q, {"schema": database_name})
+        for table_name, column_name, data_type, foreign_table, foreign_column in result:
+            # A column referencing several keys appears once per foreign key
+            if (table_name, column_name) != last_column:
+                table_schemas[table_name].append(f"{column_name} ({data_type})")
+                column_names[table_name].append(column_name)
+                last_column = (table_name, column_name)
             
-            result = await session.execute(
-                columns_query, {"schema": database_name, "table": table}
-            )
-            columns = [f"{row[0]} ({row[1]})" for row in result.fetchall()]
-            table_schemas[table] = columns
-        
-        # Get foreign key relationships
-        table_relationships = {}
-        relationships_query = text("""
-            SELECT
-                tc.table_name,
-                kcu.column_name,
-                ccu.table_name AS foreign_table_name,
-                ccu.column_name AS foreign_column_name
-            FROM information_schema.table_constraints AS tc
-            JOIN information_schema.key_column_usage AS kcu
-                ON tc.constraint_name = kcu.constraint_name
-                AND tc.table_schema = kcu.table_schema
-            JOIN information_schema.constraint_column_usage AS ccu
-                ON ccu.constraint_name = tc.constraint_name
-                AND ccu.table_schema = tc.table_schema
-            WHERE tc.constraint_type = 'FOREIGN KEY'
-                AND tc.table_schema = :schema
-            ORDER BY tc.table_name, kcu.column_name
-        """)
+            if foreign_table is not None:
+                table_relationships[table_name].append(
+                    f"{column_name} → {foreign_table}.{foreign_column}"
+                )
         
-        result = await session.execute(relationships_query, {"schema": database_name})
-        for row in result.fetchall():
-            table_name = row[0]
-            column_name = row[1]
-            foreign_table = row[2]
-            foreign_column = row[3]
-            
-            if table_name not in table_relationships:
-                table_relationships[table_name] = []
-            
-            table_relationships[table_name].append(
-                f"{column_name} → {foreign_table}.{foreign_column}"
-            )
+        available_tables = list(table_schemas)
         
         schema_context = SchemaContext(
             available_tables=available_tables,
-            table_schemas=table_schemas,
-            table_relationships=table_relationships,
+            table_schemas=dict(table_schemas),
+            table_relationships=dict(table_relationships),
+            column_names=dict(column_names),
         )
         
         # Cache schema for 1 hour
@@ -16,6 +16,18 @@ from server.db.models import ScheduledReport
 from sqlalchemy import text
 
 
+# DO block rather than separate statements: asyncpg prepares each statement,
+# so a plain multi-statement string would be rejected
+_DROP_SCHEDULED_REPORTS_SQL = """
+DO $$
+BEGIN
+    DROP TABLE IF EXISTS scheduled_reports CASCADE;
+    DROP TYPE IF EXISTS reportstatus CASCADE;
+    DROP TYPE IF EXISTS reportformat CASCADE;
+END $$
+"""
+
+
 async def recreate_table():
     """Drop and recreate the scheduled_reports table."""
     print("🔧 Recreating scheduled_reports table...")
@@ -25,24 +37,19 @@ async def recreate_table():
         await db.initialize()
         print("✅ Database connection established")
         
-        # Drop the existing table and enums
+        # Drop the existing table and enums, recreate and verify in one transaction
         async with db.engine.begin() as conn:
-            await conn.execute(text("DROP TABLE IF EXISTS scheduled_reports CASCADE"))
-            print("✅ Dropped existing scheduled_reports table")
-            
-            # Drop and recreate enum types
-            await conn.execute(text("DROP TYPE IF EXISTS reportstatus CASCADE"))
-            await conn.execute(text("DROP TYPE IF EXISTS reportformat CASCADE"))
-            print("✅ Dropped existing enum types")
+            # Single DO block so all drops go out in one round-trip
+            await conn.exec_driver_sql(_DROP_SCHEDULED_REPORTS_SQL)
+            print("✅ Dropped existing scheduled_reports table and enum types")
             
             # Create the table with correct schema
             await conn.run_sync(ScheduledReport.__table__.create)
             print("✅ Created scheduled_reports table with correct schema")
-        
-        # Verify the table structure
-        async with db.session() as session:
-            result = await session.execute(text('SELECT column_name FROM information_schema.columns WHERE table_name = \'scheduled_reports\' ORDER BY ordinal_position'))
-            columns = [row[0] for row in result.fetchall()]
+            
+            # Verify the table structure
+            result = await conn.execute(text('SELECT column_name FROM information_schema.columns WHERE table_name = \'scheduled_reports\' ORDER BY ordinal_position'))
+            columns = [row[0] for row in result]
             print("✅ New table columns:", columns)
             
     except Exception as e:
@@ -3,6 +3,7 @@ from server.scheduler.report_scheduler import (
     check_and_run_scheduled_reports,
     execute_report_now,
     cleanup_old_query_history,
+    ensure_query_history_partitions,
 )
 from server.scheduler.email_sender import send_report_email
 
@@ -10,5 +11,6 @@ __all__ = [
     "check_and_run_scheduled_reports",
     "execute_report_now",
     "cleanup_old_query_history",
+    "ensure_query_history_partitions",
     "send_report_email",
 ]
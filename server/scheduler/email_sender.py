@@ -1,17 +1,29 @@
 """
 Email sender for scheduled reports.
 """
+import asyncio
 import smtplib
+import sys
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
+from html import escape
 from pathlib import Path
 from typing import Any
 
 from shared.config import settings
 
 
+# Number of rows shown inline in the email body; the attachment has the rest
+EMAIL_PREVIEW_ROWS = 10
+
+# HTML fragments for the data preview table
+_HEADER_CELL = "<th style='padding: 12px; text-align: left; border: 1px solid #ddd;'>{}</th>"
+_DATA_CELL = "<td style='padding: 10px; border: 1px solid #ddd;'>{}</td>"
+_ROW_OPEN_EVEN = "<tr style='background-color: #f2f2f2;'>"
+_ROW_OPEN_ODD = "<tr style='background-color: white;'>"
+
 async def send_report_email(
     recipients: list[str],
     subject: str,
@@ -20,6 +32,7 @@ async def send_report_email(
     data: list[dict[str, Any]],
     attachment_path: str | None = None,
     format: str = "csv",
+    row_count: int | None = None,
 ) -> dict[str, Any]:
     """
     Send report via email.
@@ -29,9 +42,10 @@ async def send_report_email(
         subject: Email subject
         report_name: Name of the report
         description: Report description
-        data: Query results
+        data: Query results (only the first EMAIL_PREVIEW_ROWS are rendered)
         attachment_path: Path to attachment file (optional)
         format: Report format (csv, excel, pdf)
+        row_count: Total number of result rows, when data is only a preview
     
     Returns:
         Dictionary with send status
@@ -54,7 +68,7 @@ async def send_report_email(
             report_name=report_name,
             description=description,
             data=data,
-            row_count=len(data),
+            row_count=len(data) if row_count is None else row_count,
         )
         
         # Attach HTML body
@@ -64,24 +78,9 @@ async def send_report_email(
         if attachment_path and Path(attachment_path).exists():
             _attach_file(msg, attachment_path)
         
-        # Send email
-        with smtplib.SMTP(settings.email_smtp_host, settings.email_smtp_port) as server:
-            if settings.email_use_tls:
-                server.starttls()
-            
-            if settings.email_username and settings.email_password:
-                # Debug logging - write to file since print might not work in MCP context
-                import sys
-                sys.stderr.write(f"DEBUG EMAIL: Attempting login with username: {settings.email_username}\n")
-                sys.stderr.write(f"DEBUG EMAIL: Password length: {len(settings.email_password)} chars\n")
-                sys.stderr.write(f"DEBUG EMAIL: Password first 10 chars: {repr(settings.email_password[:10])}\n")
-                sys.stderr.flush()
-                server.login(settings.email_username, settings.email_password)
-                sys.stderr.write("DEBUG EMAIL: Login successful!\n")
-                sys.stderr.flush()
-            
-            server.send_message(msg)
-            print(f"DEBUG EMAIL: Message sent to {recipients}")
+        # Send through the batcher so concurrent reports share one SMTP connection
+        await email_batcher.send(msg)
+        print(f"DEBUG EMAIL: Message sent to {recipients}")
         
         return {
             "status": "success",
@@ -96,6 +95,104 @@ async def send_report_email(
         }
 
 
+class EmailBatcher:
+    """
+    Sends queued messages in batches over a single SMTP connection.
+    
+    The first queued message opens a batch window of max_wait_ms; everything
+    queued in that window (up to max_batch_size) is sent over one connection,
+    so concurrent reports pay for one TCP/TLS/AUTH handshake instead of N.
+    """
+    
+    def __init__(self, max_wait_ms: int = 200, max_batch_size: int = 50):
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker: asyncio.Task | None = None
+    
+    async def send(self, msg: MIMEMultipart) -> None:
+        """
+        Queue a message and wait until its batch has been sent.
+        
+        Raises:
+            Exception: The SMTP error that prevented this message being sent
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((msg, future))
+        await future
+    
+    def _ensure_worker(self) -> None:
+        """Start the sender task on the running loop (rebinds if called from a new event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Drain the queue in batches: flush on first item plus timeout."""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            messages = [msg for msg, _ in batch]
+            try:
+                errors = await asyncio.to_thread(_send_messages, messages)
+            except Exception as e:
+                errors = [e] * len(batch)
+            
+            for (_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+
+def _send_messages(messages: list[MIMEMultipart]) -> list[Exception | None]:
+    """Send messages over one blocking SMTP connection; returns per-message errors."""
+    errors: list[Exception | None] = [None] * len(messages)
+    
+    with smtplib.SMTP(settings.email_smtp_host, settings.email_smtp_port) as server:
+        if settings.email_use_tls:
+            server.starttls()
+        
+        if settings.email_username and settings.email_password:
+            # Debug logging - write to file since print might not work in MCP context
+            sys.stderr.write(f"DEBUG EMAIL: Attempting login with username: {settings.email_username}\n")
+            sys.stderr.write(f"DEBUG EMAIL: Password length: {len(settings.email_password)} chars\n")
+            sys.stderr.write(f"DEBUG EMAIL: Password first 10 chars: {repr(settings.email_password[:10])}\n")
+            sys.stderr.flush()
+            server.login(settings.email_username, settings.email_password)
+            sys.stderr.write("DEBUG EMAIL: Login successful!\n")
+            sys.stderr.flush()
+        
+        for i, msg in enumerate(messages):
+            try:
+                server.send_message(msg)
+            except Exception as e:
+                errors[i] = e
+    
+    return errors
+
+
+# Global email batcher instance
+email_batcher = EmailBatcher()
+
+
 def _create_html_email_body(
     report_name: str,
     description: str,
@@ -103,35 +200,33 @@ def _create_html_email_body(
     row_count: int,
 ) -> str:
     """Create HTML email body with data preview."""
-    # Limit preview to first 10 rows
-    preview_data = data[:10]
+    # Limit preview to the first few rows
+    preview_data = data[:EMAIL_PREVIEW_ROWS]
     
-    # Build HTML table
+    # Build HTML table from a list of parts joined once at the end
     table_html = ""
     if preview_data:
         columns = list(preview_data[0].keys())
         
-        table_html = "<table style='border-collapse: collapse; width: 100%; font-family: Arial, sans-serif;'>"
+        parts = ["<table style='border-collapse: collapse; width: 100%; font-family: Arial, sans-serif;'>"]
         
         # Header
-        table_html += "<thead><tr style='background-color: #4472C4; color: white;'>"
-        for col in columns:
-            table_html += f"<th style='padding: 12px; text-align: left; border: 1px solid #ddd;'>{col}</th>"
-        table_html += "</tr></thead>"
+        parts.append("<thead><tr style='background-color: #4472C4; color: white;'>")
+        parts.extend(_HEADER_CELL.format(escape(str(col))) for col in columns)
+        parts.append("</tr></thead>")
         
         # Rows
-        table_html += "<tbody>"
+        parts.append("<tbody>")
         for i, row in enumerate(preview_data):
-            bg_color = "#f2f2f2" if i % 2 == 0 else "white"
-            table_html += f"<tr style='background-color: {bg_color};'>"
-            for col in columns:
-                value = row.get(col, "")
-                table_html += f"<td style='padding: 10px; border: 1px solid #ddd;'>{value}</td>"
-            table_html += "</tr>"
-        table_html += "</tbody></table>"
+            parts.append(_ROW_OPEN_EVEN if i % 2 == 0 else _ROW_OPEN_ODD)
+            parts.extend(_DATA_CELL.format(escape(str(row.get(col, "")))) for col in columns)
+            parts.append("</tr>")
+        parts.append("</tbody></table>")
+        
+        if row_count > EMAIL_PREVIEW_ROWS:
+            parts.append(f"<p style='margin-top: 10px; color: #666;'><em>Showing {EMAIL_PREVIEW_ROWS} of {row_count} rows. See attachment for full results.</em></p>")
         
-        if row_count > 10:
-            table_html += f"<p style='margin-top: 10px; color: #666;'><em>Showing 10 of {row_count} rows. See attachment for full results.</em></p>"
+        table_html = "".join(parts)
     
     html = f"""
     <!DOCTYPE html>
@@ -149,10 +244,10 @@ def _create_html_email_body(
     <body>
         <div class="container">
             <div class="header">
-                <h1>{report_name}</h1>
+                <h1>{escape(report_name)}</h1>
             </div>
             <div class="content">
-                <p><strong>Description:</strong> {description}</p>
+                <p><strong>Description:</strong> {escape(description)}</p>
                 <p><strong>Total Rows:</strong> {row_count}</p>
                 <p><strong>Generated:</strong> {_get_current_timestamp()}</p>
                 
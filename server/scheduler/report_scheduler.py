@@ -2,24 +2,82 @@
 Report scheduler for executing scheduled queries and generating reports.
 """
 import asyncio
+import hashlib
+import re
 from datetime import datetime, timedelta, UTC
-from typing import Any
+from typing import Any, AsyncIterable
 
 from celery import shared_task
 from croniter import croniter
-from sqlalchemy import select, and_
+from sqlalchemy import select, delete, update, and_, exists, text
+from sqlalchemy.orm import joinedload
 
 from server.celery_app import celery_app
 from server.db.connection import DatabaseConnection
-from server.db.models import ScheduledReport, ReportStatus, QueryHistory, SavedQuery
+from server.db.models import ScheduledReport, ReportStatus, QueryHistory, QueryText
 from server.query.query_executor import query_executor
 from server.tools.exporters import export_to_csv, export_to_excel, export_to_pdf
-from server.scheduler.email_sender import send_report_email
+from server.scheduler.email_sender import send_report_email, EMAIL_PREVIEW_ROWS
 from shared.config import settings
+from shared.event_loop import install_event_loop_policy
 
 
 db_connection = DatabaseConnection()
 
+# Celery runs tasks synchronously. One event loop per worker process keeps the
+# connection pool (asyncpg connections are bound to their loop) alive between
+# tasks instead of reconnecting to Postgres on every Beat tick.
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+# Rows removed per DELETE statement when pruning query history
+HISTORY_CLEANUP_BATCH_ROWS = 10_000
+
+# Monthly query_history partitions created ahead of the current month
+HISTORY_PARTITION_MONTHS_AHEAD = 2
+_HISTORY_PARTITION_RE = re.compile(r"^query_history_p(\d{4})_(\d{2})$")
+
+# Parsed cron iterators keyed by expression. Reports mostly share a handful of
+# schedules, so each expression is tokenized once per worker, not per tick.
+_CRON_CACHE: dict[str, croniter] = {}
+
+# Characters in report names that are unsafe in export filenames
+_FILENAME_TRANS = str.maketrans({c: "_" for c in ' /\\:*?"<>|\n\r\t'})
+
+
+def _next_run(cron_str: str, base: datetime) -> datetime:
+    """
+    Get the next fire time of a cron expression after base.
+    
+    Args:
+        cron_str: Cron expression of the schedule
+        base: Time to compute the next run from
+        
+    Returns:
+        Next run time
+    """
+    cron = _CRON_CACHE.get(cron_str)
+    if cron is None:
+        cron = _CRON_CACHE[cron_str] = croniter(cron_str, base)
+    else:
+        cron.set_current(base, force=True)
+    return cron.get_next(datetime)
+
+
+def _month_start(value: datetime, offset: int = 0) -> datetime:
+    """First instant of the month `offset` months after value's month."""
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def _run_async(coro):
+    """Run a coroutine to completion on this worker process's event loop."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        install_event_loop_policy()
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
 
 @shared_task(bind=True, name="server.scheduler.report_scheduler.check_and_run_scheduled_reports")
 def check_and_run_scheduled_reports(self):
@@ -27,87 +85,130 @@ def check_and_run_scheduled_reports(self):
     Check for scheduled reports that need to run and execute them.
     Called every minute by Celery Beat.
     """
-    return asyncio.run(_check_and_run_scheduled_reports_async())
+    return _run_async(_check_and_run_scheduled_reports_async())
 
 
 async def _check_and_run_scheduled_reports_async():
     """Async implementation of check_and_run_scheduled_reports."""
-    await db_connection.connect()
+    # Find active reports that are due to run
+    now = datetime.now(UTC).replace(tzinfo=None)
     
-    try:
-        async with db_connection.get_session() as session:
-            # Find active reports that are due to run
-            now = datetime.now(UTC).replace(tzinfo=None)
-            
-            stmt = select(ScheduledReport).where(
-                and_(
-                    ScheduledReport.is_active == True,
-                    ScheduledReport.next_run_at <= now,
-                )
+    async with db_connection.session() as session:
+        stmt = select(ScheduledReport.id).where(
+            and_(
+                ScheduledReport.is_active == True,
+                ScheduledReport.next_run_at <= now,
             )
+        )
+        result = await session.execute(stmt)
+        report_ids = result.scalars().all()
+    
+    # Run due reports concurrently, each in its own session so commits
+    # don't serialize, with fan-out bounded to protect the pool
+    semaphore = asyncio.Semaphore(settings.scheduler_concurrency)
+    shared_exports: dict[tuple, asyncio.Future] = {}
+    
+    async def run_report(report_id: int) -> bool:
+        async with semaphore, db_connection.session() as session:
+            report = await session.get(
+                ScheduledReport,
+                report_id,
+                options=[joinedload(ScheduledReport.saved_query)],
+            )
+            if report is None:
+                return False
             
-            result = await session.execute(stmt)
-            reports = result.scalars().all()
-            
-            executed_count = 0
-            
-            for report in reports:
-                try:
-                    # Execute the report
-                    await _execute_scheduled_report(report, session)
-                    executed_count += 1
-                    
-                    # Update next run time
-                    cron = croniter(report.schedule_cron, now)
-                    report.next_run_at = cron.get_next(datetime)
-                    report.last_run_at = now
-                    report.status = ReportStatus.COMPLETED
-                    
-                except Exception as e:
-                    print(f"Error executing report {report.id}: {e}")
-                    report.status = ReportStatus.FAILED
+            try:
+                # Execute the report
+                await _execute_scheduled_report(report, session, now, shared_exports)
                 
-                await session.commit()
-            
-            return {
-                "checked_at": now.isoformat(),
-                "reports_found": len(reports),
-                "reports_executed": executed_count,
-            }
+                # Update next run time
+                await _update_report(
+                    session,
+                    report_id,
+                    next_run_at=_next_run(report.schedule_cron, now),
+                    last_run_at=now,
+                    status=ReportStatus.COMPLETED,
+                )
+                return True
+                
+            except Exception as e:
+                print(f"Error executing report {report_id}: {e}")
+                # A failed query aborts the transaction; start a fresh one
+                await session.rollback()
+                await _update_report(session, report_id, status=ReportStatus.FAILED)
+                return False
     
-    finally:
-        await db_connection.disconnect()
+    outcomes = await asyncio.gather(
+        *(run_report(report_id) for report_id in report_ids),
+        return_exceptions=True,
+    )
+    executed_count = sum(1 for outcome in outcomes if outcome is True)
+    
+    return {
+        "checked_at": now.isoformat(),
+        "reports_found": len(report_ids),
+        "reports_executed": executed_count,
+    }
 
 
-async def _execute_scheduled_report(report: ScheduledReport, session):
-    """Execute a single scheduled report."""
-    # Load the saved query
-    if report.saved_query_id:
-        stmt = select(SavedQuery).where(SavedQuery.id == report.saved_query_id)
-        result = await session.execute(stmt)
-        saved_query = result.scalar_one_or_none()
-        
-        if not saved_query:
-            raise ValueError(f"Saved query {report.saved_query_id} not found")
-        
-        sql = saved_query.sql_query
-    else:
-        raise ValueError("Report has no associated saved query")
+async def _update_report(session, report_id: int, **values) -> None:
+    """
+    Write report columns with a single UPDATE and commit.
     
-    # Execute the query
-    query_result = await query_executor.execute_query(
-        sql=sql,
-        user_id=report.user_id,
-        session=session,
-        cache_results=False,  # Don't cache scheduled report results
+    Args:
+        session: Database session
+        report_id: ID of the scheduled report
+        **values: Column values to set
+    """
+    stmt = (
+        update(ScheduledReport)
+        .where(ScheduledReport.id == report_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
     )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def _execute_scheduled_report(
+    report: ScheduledReport,
+    session,
+    now: datetime,
+    shared_exports: dict[tuple, asyncio.Future] | None = None,
+):
+    """
+    Execute a single scheduled report.
     
-    # Export to requested format
-    export_path = await _export_report(
-        report=report,
-        data=query_result["rows"],
-        format=report.format.value,
-    )
+    Args:
+        report: Report to run, with its saved_query loaded
+        session: Database session
+        now: Run time of the task, used for the export filename
+        shared_exports: Exports started during this scheduler tick, keyed by
+            (user_id, sql, format). Reports that match an entry reuse its
+            file instead of running the query and export again.
+    """
+    # The saved query is eager-loaded along with the report
+    if not report.saved_query_id:
+        raise ValueError("Report has no associated saved query")
+    if report.saved_query is None:
+        raise ValueError(f"Saved query {report.saved_query_id} not found")
+    
+    sql = report.saved_query.generated_sql
+    
+    # Same user (so same RBAC filters), SQL and format produce the same file
+    if shared_exports is None:
+        export = await _run_report_export(report, sql, session, now)
+    else:
+        export_key = (report.user_id, sql, report.format.value)
+        export_task = shared_exports.get(export_key)
+        if export_task is None:
+            export_task = asyncio.ensure_future(
+                _run_report_export(report, sql, session, now, export_key)
+            )
+            shared_exports[export_key] = export_task
+        export = await asyncio.shield(export_task)
+    export_path, preview, row_count = export
     
     # Send email if recipients specified
     if report.recipients and len(report.recipients) > 0:
@@ -116,22 +217,81 @@ async def _execute_scheduled_report(report: ScheduledReport, session):
             subject=f"Scheduled Report: {report.name}",
             report_name=report.name,
             description=report.description or "",
-            data=query_result["rows"],
+            data=preview,
+            row_count=row_count,
             attachment_path=export_path,
             format=report.format.value,
         )
 
 
-async def _export_report(report: ScheduledReport, data: list[dict], format: str) -> str:
-    """Export report data to the specified format."""
-    filename = f"{report.name.replace(' ', '_')}_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}"
+async def _run_report_export(
+    report: ScheduledReport,
+    sql: str,
+    session,
+    now: datetime,
+    export_key: tuple | None = None,
+) -> tuple[str, list[dict], int]:
+    """
+    Run a report's query and export it to the report's format.
+    
+    Args:
+        export_key: Share key when other reports may attach the same file
+    
+    Returns:
+        Tuple of (export path, email preview rows, total row count)
+    """
+    # Stream rows from a server-side cursor straight into the export file,
+    # keeping only the email preview rows in memory
+    preview: list[dict] = []
+    row_count = 0
+    
+    async def tee_batches():
+        nonlocal row_count
+        async for batch in query_executor.stream_query(
+            sql=sql,
+            user_id=report.user_id,
+            session=session,
+        ):
+            if len(preview) < EMAIL_PREVIEW_ROWS:
+                preview.extend(batch[:EMAIL_PREVIEW_ROWS - len(preview)])
+            row_count += len(batch)
+            yield batch
+    
+    # Export to requested format
+    export_path = await _export_report(
+        report=report,
+        data=tee_batches(),
+        format=report.format.value,
+        now=now,
+        export_key=export_key,
+    )
+    return export_path, preview, row_count
+
+
+async def _export_report(
+    report: ScheduledReport,
+    data: list[dict] | AsyncIterable[list[dict]],
+    format: str,
+    now: datetime,
+    export_key: tuple | None = None,
+) -> str:
+    """Export report data (rows or streamed row batches) to the specified format."""
+    name = report.name
+    suffix = ""
+    if export_key is not None:
+        # A shared file is attached to every report with the same user, SQL
+        # and format, so it is named after their saved query rather than
+        # after whichever report started the export
+        name = report.saved_query.name
+        suffix = "_" + hashlib.blake2b(repr(export_key).encode(), digest_size=4).hexdigest()
+    filename = f"{name.translate(_FILENAME_TRANS)}{suffix}_{now.strftime('%Y%m%d_%H%M%S')}"
     
     if format == "csv":
         return await export_to_csv(data, filename)
     elif format == "excel":
-        return await export_to_excel(data, filename, title=report.name)
+        return await export_to_excel(data, filename, title=name)
     elif format == "pdf":
-        return await export_to_pdf(data, filename, title=report.name)
+        return await export_to_pdf(data, filename, title=name)
     else:
         raise ValueError(f"Unsupported format: {format}")
 
@@ -148,57 +308,60 @@ def execute_report_now(self, report_id: int, user_id: int):
     Returns:
         Dictionary with execution results
     """
-    return asyncio.run(_execute_report_now_async(report_id, user_id))
+    return _run_async(_execute_report_now_async(report_id, user_id))
 
 
 async def _execute_report_now_async(report_id: int, user_id: int):
     """Async implementation of execute_report_now."""
-    await db_connection.connect()
+    now = datetime.now(UTC).replace(tzinfo=None)
     
-    try:
-        async with db_connection.get_session() as session:
-            # Load the report
-            stmt = select(ScheduledReport).where(
+    async with db_connection.session() as session:
+        # Load the report
+        stmt = (
+            select(ScheduledReport)
+            .options(joinedload(ScheduledReport.saved_query))
+            .where(
                 and_(
                     ScheduledReport.id == report_id,
                     ScheduledReport.user_id == user_id,
                 )
             )
-            result = await session.execute(stmt)
-            report = result.scalar_one_or_none()
+        )
+        result = await session.execute(stmt)
+        report = result.scalar_one_or_none()
+        
+        if not report:
+            return {
+                "error": "Report not found or access denied",
+                "status": "error",
+            }
+        
+        # Execute the report
+        try:
+            await _execute_scheduled_report(report, session, now)
             
-            if not report:
-                return {
-                    "error": "Report not found or access denied",
-                    "status": "error",
-                }
+            # Update last run time
+            await _update_report(
+                session,
+                report_id,
+                last_run_at=now,
+                status=ReportStatus.COMPLETED,
+            )
             
-            # Execute the report
-            try:
-                await _execute_scheduled_report(report, session)
-                
-                # Update last run time
-                report.last_run_at = datetime.now(UTC).replace(tzinfo=None)
-                report.status = ReportStatus.COMPLETED
-                await session.commit()
-                
-                return {
-                    "report_id": report_id,
-                    "report_name": report.name,
-                    "executed_at": report.last_run_at.isoformat(),
-                    "status": "success",
-                }
-                
-            except Exception as e:
-                report.status = ReportStatus.FAILED
-                await session.commit()
-                return {
-                    "error": str(e),
-                    "status": "error",
-                }
-    
-    finally:
-        await db_connection.disconnect()
+            return {
+                "report_id": report_id,
+                "report_name": report.name,
+                "executed_at": now.isoformat(),
+                "status": "success",
+            }
+            
+        except Exception as e:
+            await session.rollback()
+            await _update_report(session, report_id, status=ReportStatus.FAILED)
+            return {
+                "error": str(e),
+                "status": "error",
+            }
 
 
 @shared_task(bind=True, name="server.scheduler.report_scheduler.cleanup_old_query_history")
@@ -212,36 +375,104 @@ def cleanup_old_query_history(self, days_to_keep: int = 90):
     Returns:
         Number of records deleted
     """
-    return asyncio.run(_cleanup_old_query_history_async(days_to_keep))
+    return _run_async(_cleanup_old_query_history_async(days_to_keep))
 
 
 async def _cleanup_old_query_history_async(days_to_keep: int):
     """Async implementation of cleanup_old_query_history."""
-    await db_connection.connect()
-    
-    try:
-        async with db_connection.get_session() as session:
-            cutoff_date = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days_to_keep)
-            
-            # Delete old records
-            stmt = select(QueryHistory).where(
-                QueryHistory.created_at < cutoff_date
-            )
+    async with db_connection.session() as session:
+        cutoff_date = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days_to_keep)
+        
+        # Delete old records in bounded batches, so a large backlog doesn't
+        # hold one long transaction open (and block vacuum)
+        batch_ids = (
+            select(QueryHistory.id)
+            .where(QueryHistory.created_at < cutoff_date)
+            .limit(HISTORY_CLEANUP_BATCH_ROWS)
+            .scalar_subquery()
+        )
+        stmt = (
+            delete(QueryHistory)
+            .where(QueryHistory.id.in_(batch_ids), QueryHistory.created_at < cutoff_date)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Months entirely before the cutoff are dropped as whole partitions,
+        # which is instant and leaves nothing to vacuum
+        partitions = await session.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'query_history'::regclass"
+        ))
+        dropped = []
+        for (name,) in partitions.all():
+            match = _HISTORY_PARTITION_RE.match(name)
+            if match and _month_start(datetime(int(match[1]), int(match[2]), 1), 1) <= cutoff_date:
+                await session.execute(text(f'DROP TABLE "{name}"'))
+                dropped.append(name)
+        await session.commit()
+        
+        count = 0
+        while True:
             result = await session.execute(stmt)
-            old_records = result.scalars().all()
-            
-            count = len(old_records)
-            
-            for record in old_records:
-                await session.delete(record)
-            
             await session.commit()
-            
-            return {
-                "deleted_count": count,
-                "cutoff_date": cutoff_date.isoformat(),
-                "status": "success",
-            }
+            count += result.rowcount
+            if result.rowcount < HISTORY_CLEANUP_BATCH_ROWS:
+                break
+        
+        # Drop question/SQL texts no longer referenced by any history row
+        await session.execute(
+            delete(QueryText)
+            .where(~exists().where(QueryHistory.query_fingerprint == QueryText.fingerprint))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        
+        return {
+            "deleted_count": count,
+            "dropped_partitions": dropped,
+            "cutoff_date": cutoff_date.isoformat(),
+            "status": "success",
+        }
+
+
+@shared_task(bind=True, name="server.scheduler.report_scheduler.ensure_query_history_partitions")
+def ensure_query_history_partitions(self, months_ahead: int = HISTORY_PARTITION_MONTHS_AHEAD):
+    """
+    Create the monthly query_history partitions for the coming months.
+    
+    Args:
+        months_ahead: Months after the current one to create (default: 2)
+    
+    Returns:
+        Partition names that exist for the current and coming months
+    """
+    return _run_async(_ensure_query_history_partitions_async(months_ahead))
+
+
+async def _ensure_query_history_partitions_async(months_ahead: int):
+    """Async implementation of ensure_query_history_partitions."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    partitions = []
+    
+    async with db_connection.session() as session:
+        for offset in range(months_ahead + 1):
+            start = _month_start(now, offset)
+            end = _month_start(now, offset + 1)
+            name = f"query_history_p{start:%Y_%m}"
+            try:
+                await session.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF query_history '
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+                await session.commit()
+                partitions.append(name)
+            except Exception as e:
+                # e.g. rows for that month already sit in the default partition
+                await session.rollback()
+                print(f"⚠️  Could not create partition {name}: {e}")
     
-    finally:
-        await db_connection.disconnect()
+    return {
+        "partitions": partitions,
+        "status": "success",
+    }
@@ -1,15 +1,25 @@
 """Tools module."""
-from server.tools.chart_generator import chart_generator, ChartGenerator
-from server.tools.history import history_manager, HistoryManager
-from server.tools.exporters import export_to_csv, export_to_excel, export_to_pdf, export_to_json
-
-__all__ = [
-    "chart_generator",
-    "ChartGenerator",
-    "history_manager",
-    "HistoryManager",
-    "export_to_csv",
-    "export_to_excel",
-    "export_to_pdf",
-    "export_to_json",
-]
+from importlib import import_module
+
+# Exported name -> submodule. Submodules are imported on first access so that
+# importing one tool (e.g. the exporters in a Celery worker) doesn't also load
+# matplotlib for the chart generator.
+_EXPORTS = {
+    "chart_generator": "chart_generator",
+    "ChartGenerator": "chart_generator",
+    "history_manager": "history",
+    "HistoryManager": "history",
+    "export_to_csv": "exporters",
+    "export_to_excel": "exporters",
+    "export_to_pdf": "exporters",
+    "export_to_json": "exporters",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f"{__name__}.{module_name}"), name)
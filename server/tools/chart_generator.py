@@ -2,18 +2,66 @@
 Chart generation tool using matplotlib.
 Automatically detects chart type based on data structure.
 """
-from datetime import datetime
+import heapq
+import threading
+from datetime import date, datetime
 from pathlib import Path
 from typing import Any, Literal
 
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for faster rendering
-import matplotlib.pyplot as plt
-import pandas as pd
+import matplotlib.style
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Fast style with minimal overhead. Figures are drawn on Agg canvases directly,
+# so pyplot's global figure manager is never involved.
+matplotlib.style.use("fast")
 
 
 ChartType = Literal["bar", "line", "pie", "scatter", "table"]
 
+# Column name -> column values, in row order
+Columns = dict[str, list[Any]]
+
+
+def _is_numeric_column(values: list[Any]) -> bool:
+    """True if every non-NULL value is a number (bools excluded), and there is one."""
+    seen = False
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        seen = True
+    return seen
+
+
+def _is_datetime_column(values: list[Any]) -> bool:
+    """True if every non-NULL value is a date or datetime, and there is one."""
+    seen = False
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, (date, datetime)):
+            return False
+        seen = True
+    return seen
+
+
+# High-contrast pie slice colors
+_PIE_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+               "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf")
+
+
+def _pie_autopct(pct: float) -> str:
+    """Show the percentage only on slices of at least 2%."""
+    return f"{pct:.1f}%" if pct >= 2 else ""
+
+
+def _as_float(value: Any) -> float:
+    """Plot NULLs as gaps (NaN) rather than failing."""
+    return float("nan") if value is None else value
+
 
 class ChartGenerator:
     """Generate charts from query results."""
@@ -28,8 +76,12 @@ class ChartGenerator:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Set matplotlib style - fast style with minimal overhead
-        plt.style.use("fast")
+        # Figures are created once and cleared between charts instead of
+        # allocating a new Figure/canvas per call. Agg isn't thread-safe, so
+        # rendering into the shared figures is serialized.
+        self._chart_fig: Figure | None = None
+        self._table_fig: Figure | None = None
+        self._render_lock = threading.Lock()
     
     def generate_chart(
         self,
@@ -58,75 +110,77 @@ class ChartGenerator:
         if not data:
             raise ValueError("Cannot generate chart from empty data")
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
+        # Split rows into columns; plain lists are all the charts need
+        columns: Columns = {col: [row.get(col) for row in data] for col in data[0]}
         
         # Auto-detect chart type if not specified
         if chart_type is None:
-            chart_type = self._detect_chart_type(df)
+            chart_type = self._detect_chart_type(columns, len(data))
         
         # Auto-detect columns if not specified
         if x_column is None or y_column is None:
-            x_column, y_column = self._detect_columns(df)
+            x_column, y_column = self._detect_columns(columns)
         
         # Generate title if not specified
         if title is None:
             title = f"{chart_type.title()} Chart: {y_column} by {x_column}"
         
-        # Create figure with optimized settings
-        fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
-        
-        # Generate chart based on type
-        if chart_type == "bar":
-            self._create_bar_chart(ax, df, x_column, y_column, title)
-        elif chart_type == "line":
-            self._create_line_chart(ax, df, x_column, y_column, title)
-        elif chart_type == "pie":
-            self._create_pie_chart(ax, df, x_column, y_column, title)
-        elif chart_type == "scatter":
-            self._create_scatter_chart(ax, df, x_column, y_column, title)
-        else:
-            raise ValueError(f"Unsupported chart type: {chart_type}")
-        
         # Save chart with optimized settings
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{chart_type}_{timestamp}.png"
         filepath = self.output_dir / filename
         
-        # Use moderate DPI and optimize flag for faster saving
-        plt.savefig(filepath, dpi=150, bbox_inches="tight")
-        plt.close(fig)  # Close specific figure for memory cleanup
+        with self._render_lock:
+            # Reuse the chart figure; clearing it drops the previous axes
+            if self._chart_fig is None:
+                self._chart_fig = Figure(figsize=(10, 6), dpi=100)
+                FigureCanvasAgg(self._chart_fig)
+            fig = self._chart_fig
+            fig.clear()
+            ax = fig.add_subplot()
+            
+            # Generate chart based on type
+            if chart_type == "bar":
+                self._create_bar_chart(ax, columns[x_column], columns[y_column], x_column, y_column, title)
+            elif chart_type == "line":
+                self._create_line_chart(ax, columns[x_column], columns[y_column], x_column, y_column, title)
+            elif chart_type == "pie":
+                self._create_pie_chart(ax, columns[x_column], columns[y_column], x_column, y_column, title)
+            elif chart_type == "scatter":
+                self._create_scatter_chart(ax, columns[x_column], columns[y_column], x_column, y_column, title)
+            else:
+                raise ValueError(f"Unsupported chart type: {chart_type}")
+            
+            # Use moderate DPI and optimize flag for faster saving
+            fig.savefig(filepath, dpi=150, bbox_inches="tight")
         
         return str(filepath)
     
-    def _detect_chart_type(self, df: pd.DataFrame) -> ChartType:
+    def _detect_chart_type(self, columns: Columns, num_rows: int) -> ChartType:
         """Auto-detect appropriate chart type based on data structure."""
-        num_rows = len(df)
-        num_cols = len(df.columns)
+        num_cols = len(columns)
+        numeric_cols = [col for col, values in columns.items() if _is_numeric_column(values)]
         
         # Pie chart: few categories with one numeric value
-        if num_rows <= 10 and num_cols == 2:
-            numeric_cols = df.select_dtypes(include=["number"]).columns
-            if len(numeric_cols) == 1:
-                return "pie"
+        if num_rows <= 10 and num_cols == 2 and len(numeric_cols) == 1:
+            return "pie"
         
         # Scatter: two numeric columns
-        numeric_cols = df.select_dtypes(include=["number"]).columns
         if len(numeric_cols) >= 2:
             return "scatter"
         
         # Line chart: time series data
-        date_cols = df.select_dtypes(include=["datetime64"]).columns
+        date_cols = [col for col, values in columns.items() if _is_datetime_column(values)]
         if len(date_cols) >= 1 and len(numeric_cols) >= 1:
             return "line"
         
         # Default to bar chart
         return "bar"
     
-    def _detect_columns(self, df: pd.DataFrame) -> tuple[str, str]:
+    def _detect_columns(self, columns: Columns) -> tuple[str, str]:
         """Auto-detect x and y columns."""
-        numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-        non_numeric_cols = df.select_dtypes(exclude=["number"]).columns.tolist()
+        numeric_cols = [col for col, values in columns.items() if _is_numeric_column(values)]
+        non_numeric_cols = [col for col in columns if col not in numeric_cols]
         
         # Prefer non-numeric for x-axis, numeric for y-axis
         if non_numeric_cols and numeric_cols:
@@ -137,121 +191,113 @@ class ChartGenerator:
             return numeric_cols[0], numeric_cols[1]
         
         # Fallback to first two columns
-        cols = df.columns.tolist()
+        cols = list(columns)
         return cols[0], cols[1] if len(cols) > 1 else cols[0]
     
     def _create_bar_chart(
         self,
-        ax: plt.Axes,
-        df: pd.DataFrame,
+        ax: Axes,
+        x_values: list[Any],
+        y_values: list[Any],
         x_column: str,
         y_column: str,
         title: str,
     ) -> None:
         """Create bar chart."""
         # Sort by y value and limit to top 15 for faster rendering
-        df_sorted = df.nlargest(15, y_column)
+        top = heapq.nlargest(
+            15,
+            ((x, y) for x, y in zip(x_values, y_values) if y is not None),
+            key=lambda pair: pair[1],
+        )
         
         # Create bars without edges for faster rendering
-        ax.bar(df_sorted[x_column].astype(str), df_sorted[y_column], 
-               color="steelblue", edgecolor="none")
+        bars = ax.bar([str(x) for x, _ in top], [y for _, y in top], 
+                      color="steelblue", edgecolor="none")
         ax.set_xlabel(x_column.replace("_", " ").title())
         ax.set_ylabel(y_column.replace("_", " ").title())
         ax.set_title(title, fontsize=13, fontweight="bold")
         
         # Rotate x labels if needed
-        if len(df_sorted) > 8:
-            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha="right")
+        if len(top) > 8:
+            for label in ax.get_xticklabels():
+                label.set_rotation(45)
+                label.set_ha("right")
         
         # Add value labels on top of bars (only if not too many)
-        if len(df_sorted) <= 10:
-            for i, v in enumerate(df_sorted[y_column]):
-                ax.text(i, v, f"{v:,.0f}", ha="center", va="bottom", fontsize=8)
+        if len(top) <= 10:
+            ax.bar_label(bars, fmt="{:,.0f}", fontsize=8)
     
     def _create_line_chart(
         self,
-        ax: plt.Axes,
-        df: pd.DataFrame,
+        ax: Axes,
+        x_values: list[Any],
+        y_values: list[Any],
         x_column: str,
         y_column: str,
         title: str,
     ) -> None:
         """Create line chart."""
-        ax.plot(df[x_column], df[y_column], marker="o", linewidth=2, 
+        ax.plot(x_values, [_as_float(y) for y in y_values], marker="o", linewidth=2, 
                 color="steelblue", markersize=4)
         ax.set_xlabel(x_column.replace("_", " ").title())
         ax.set_ylabel(y_column.replace("_", " ").title())
         ax.set_title(title, fontsize=13, fontweight="bold")
         
         # Rotate x labels if needed
-        if len(df) > 8:
-            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha="right")
+        if len(x_values) > 8:
+            for label in ax.get_xticklabels():
+                label.set_rotation(45)
+                label.set_ha("right")
         
         # Add lighter grid
         ax.grid(True, alpha=0.2, linewidth=0.5)
     
     def _create_pie_chart(
         self,
-        ax: plt.Axes,
-        df: pd.DataFrame,
+        ax: Axes,
+        x_values: list[Any],
+        y_values: list[Any],
         x_column: str,
         y_column: str,
         title: str,
     ) -> None:
         """Create pie chart with smart grouping for small slices."""
         # Sort by value descending
-        df_sorted = df.sort_values(y_column, ascending=False).reset_index(drop=True)
-        
-        # Calculate total and percentages
-        total = df_sorted[y_column].sum()
-        df_sorted['percentage'] = (df_sorted[y_column] / total) * 100
+        slices = sorted(
+            ((str(x), y) for x, y in zip(x_values, y_values) if y is not None),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )
         
-        # Group small slices (< 3%) into "Others" for cleaner visualization
+        # Group small slices (< 3% of the total) into "Others" for cleaner visualization
         threshold = 3.0
-        main_items = df_sorted[df_sorted['percentage'] >= threshold]
-        small_items = df_sorted[df_sorted['percentage'] < threshold]
+        cutoff = sum(y for _, y in slices) * threshold / 100
+        plot_data = []
+        others = 0
+        for x, y in slices:
+            if y >= cutoff:
+                plot_data.append((x, y))
+            else:
+                others += y
         
         # If we have small items, add "Others" category
-        if len(small_items) > 0:
-            others_sum = small_items[y_column].sum()
-            others_row = pd.DataFrame({
-                x_column: ['Others'],
-                y_column: [others_sum],
-                'percentage': [(others_sum / total) * 100]
-            })
-            plot_data = pd.concat([main_items, others_row], ignore_index=True)
-        else:
-            plot_data = main_items
+        if len(plot_data) < len(slices):
+            plot_data.append(("Others", others))
         
         # Limit to max 8 slices total for clean visualization
         if len(plot_data) > 8:
-            top_7 = plot_data.head(7)
-            rest = plot_data.tail(len(plot_data) - 7)
-            rest_sum = rest[y_column].sum()
-            others_row = pd.DataFrame({
-                x_column: ['Others'],
-                y_column: [rest_sum],
-                'percentage': [(rest_sum / total) * 100]
-            })
-            plot_data = pd.concat([top_7, others_row], ignore_index=True)
-        
-        # Use high-contrast colors
-        colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
-                  '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-        
-        # Custom function to show percentage only for slices >= 2%
-        def autopct_format(pct):
-            return f'{pct:.1f}%' if pct >= 2 else ''
+            plot_data = plot_data[:7] + [("Others", sum(y for _, y in plot_data[7:]))]
         
         # Create pie chart with explode effect for emphasis
         explode = [0.05 if i == 0 else 0 for i in range(len(plot_data))]
         
         wedges, texts, autotexts = ax.pie(
-            plot_data[y_column],
-            labels=plot_data[x_column].astype(str),
-            autopct=autopct_format,
+            [y for _, y in plot_data],
+            labels=[x for x, _ in plot_data],
+            autopct=_pie_autopct,
             startangle=90,
-            colors=colors[:len(plot_data)],
+            colors=_PIE_COLORS[:len(plot_data)],
             explode=explode,
             pctdistance=0.85,
             textprops={'fontsize': 10}
@@ -271,14 +317,16 @@ class ChartGenerator:
     
     def _create_scatter_chart(
         self,
-        ax: plt.Axes,
-        df: pd.DataFrame,
+        ax: Axes,
+        x_values: list[Any],
+        y_values: list[Any],
         x_column: str,
         y_column: str,
         title: str,
     ) -> None:
         """Create scatter chart."""
-        ax.scatter(df[x_column], df[y_column], alpha=0.6, s=40, color="steelblue")
+        ax.scatter([_as_float(x) for x in x_values], [_as_float(y) for y in y_values],
+                   alpha=0.6, s=40, color="steelblue")
         ax.set_xlabel(x_column.replace("_", " ").title())
         ax.set_ylabel(y_column.replace("_", " ").title())
         ax.set_title(title, fontsize=13, fontweight="bold")
@@ -306,21 +354,41 @@ class ChartGenerator:
         if not data:
             raise ValueError("Cannot generate table from empty data")
         
-        # Convert to DataFrame and limit rows
-        df = pd.DataFrame(data).head(max_rows)
-        
-        # Create figure
-        fig, ax = plt.subplots(figsize=(14, len(df) * 0.5 + 2))
+        # Limit rows and split into header + cell values
+        col_labels = list(data[0].keys())
+        cell_text = [[row.get(col) for col in col_labels] for row in data[:max_rows]]
+        
+        with self._render_lock:
+            # Reuse the table figure, resized to the number of rows
+            if self._table_fig is None:
+                self._table_fig = Figure()
+                FigureCanvasAgg(self._table_fig)
+            fig = self._table_fig
+            fig.clear()
+            fig.set_size_inches(14, len(cell_text) * 0.5 + 2)
+            ax = fig.add_subplot()
+            
+            return self._render_table(fig, ax, col_labels, cell_text, title)
+    
+    def _render_table(
+        self,
+        fig: Figure,
+        ax: Axes,
+        col_labels: list[str],
+        cell_text: list[list[Any]],
+        title: str | None,
+    ) -> str:
+        """Draw a styled table onto ax and save the figure."""
         ax.axis("tight")
         ax.axis("off")
         
         # Create table
         table = ax.table(
-            cellText=df.values,
-            colLabels=df.columns,
+            cellText=cell_text,
+            colLabels=col_labels,
             cellLoc="left",
             loc="center",
-            colWidths=[0.15] * len(df.columns),
+            colWidths=[0.15] * len(col_labels),
         )
         
         # Style table
@@ -329,27 +397,26 @@ class ChartGenerator:
         table.scale(1, 2)
         
         # Color header
-        for i in range(len(df.columns)):
+        for i in range(len(col_labels)):
             table[(0, i)].set_facecolor("#4472C4")
             table[(0, i)].set_text_props(weight="bold", color="white")
         
         # Alternate row colors
-        for i in range(1, len(df) + 1):
+        for i in range(1, len(cell_text) + 1):
             color = "#F2F2F2" if i % 2 == 0 else "white"
-            for j in range(len(df.columns)):
+            for j in range(len(col_labels)):
                 table[(i, j)].set_facecolor(color)
         
         # Add title
         if title:
-            plt.title(title, fontsize=14, fontweight="bold", pad=20)
+            ax.set_title(title, fontsize=14, fontweight="bold", pad=20)
         
         # Save table
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"table_{timestamp}.png"
         filepath = self.output_dir / filename
         
-        plt.savefig(filepath, dpi=300, bbox_inches="tight")
-        plt.close()
+        fig.savefig(filepath, dpi=300, bbox_inches="tight")
         
         return str(filepath)
 
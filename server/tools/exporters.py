@@ -1,94 +1,128 @@
 """
 Export query results to various formats (CSV, Excel, PDF).
 """
+import asyncio
 import csv
-from datetime import datetime, UTC
+from contextlib import suppress
+from datetime import date, datetime, UTC
+from decimal import Decimal
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterable, AsyncIterator
 
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+import orjson
+import xlsxwriter
 
 
 # Export directory
 EXPORT_DIR = Path("exports")
 EXPORT_DIR.mkdir(exist_ok=True)
 
+# Rows rendered into a PDF table (matches the default max_query_results)
+PDF_MAX_ROWS = 1000
+
+# Timestamps from the database are naive UTC
+_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC
+
+# Values xlsxwriter writes natively; anything else (UUID, json dict/list, ...)
+# is written as its string form
+_EXCEL_NATIVE_TYPES = (str, int, float, Decimal, bool, date, datetime)
+
+
+async def _iter_batches(
+    data: list[dict[str, Any]] | AsyncIterable[list[dict[str, Any]]],
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Yield row batches from either a row list or an async iterable of batches."""
+    if isinstance(data, list):
+        yield data
+        return
+    async for batch in data:
+        yield batch
+
 
 async def export_to_csv(
-    data: list[dict[str, Any]],
+    data: list[dict[str, Any]] | AsyncIterable[list[dict[str, Any]]],
     filename: str | None = None,
+    fieldnames: list[str] | None = None,
 ) -> str:
     """
     Export data to CSV file.
     
+    Rows are written batch by batch, so a streamed result (see
+    QueryExecutor.stream_query) is never held in memory all at once.
+    
     Args:
-        data: List of dictionaries containing query results
+        data: List of dictionaries, or async iterable of row batches
         filename: Output filename (without extension)
+        fieldnames: Column names (taken from the first row if omitted)
     
     Returns:
         Path to exported file
     """
-    if not data:
-        raise ValueError("Cannot export empty data")
-    
     # Generate filename if not provided
     if filename is None:
         filename = f"export_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}"
     
     filepath = EXPORT_DIR / f"{filename}.csv"
+    row_count = 0
     
     # Write CSV
-    with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
-        if data:
-            fieldnames = list(data[0].keys())
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(data)
+    try:
+        with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
+            writer = None
+            async for batch in _iter_batches(data):
+                if not batch:
+                    continue
+                if writer is None:
+                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames or list(batch[0].keys()))
+                    writer.writeheader()
+                # Write off the event loop so other reports/queries keep running
+                await asyncio.to_thread(writer.writerows, batch)
+                row_count += len(batch)
+    except BaseException:
+        # Don't leave a half-written export behind (fetch error, cancellation, ...)
+        filepath.unlink(missing_ok=True)
+        raise
+    
+    if row_count == 0:
+        filepath.unlink(missing_ok=True)
+        raise ValueError("Cannot export empty data")
     
     return str(filepath)
 
 
 async def export_to_excel(
-    data: list[dict[str, Any]],
+    data: list[dict[str, Any]] | AsyncIterable[list[dict[str, Any]]],
     filename: str | None = None,
     title: str | None = None,
 ) -> str:
     """
     Export data to Excel file with formatting.
     
+    Uses xlsxwriter's constant_memory mode, which flushes each row to disk
+    as soon as the next one starts, so streamed results stay out of memory.
+    
     Args:
-        data: List of dictionaries containing query results
+        data: List of dictionaries, or async iterable of row batches
         filename: Output filename (without extension)
         title: Worksheet title
     
     Returns:
         Path to exported file
     """
-    if not data:
-        raise ValueError("Cannot export empty data")
-    
     # Generate filename if not provided
     if filename is None:
         filename = f"export_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}"
     
     filepath = EXPORT_DIR / f"{filename}.xlsx"
     
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-    
-    # Create Excel writer
-    with pd.ExcelWriter(filepath, engine="xlsxwriter") as writer:
-        # Write data
-        df.to_excel(writer, sheet_name="Data", index=False)
-        
-        # Get workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets["Data"]
+    workbook = xlsxwriter.Workbook(str(filepath), {
+        "constant_memory": True,
+        "use_zip64": True,
+        "default_date_format": "yyyy-mm-dd",
+        "remove_timezone": True,
+    })
+    try:
+        worksheet = workbook.add_worksheet("Data")
         
         # Add formats
         header_format = workbook.add_format({
@@ -99,56 +133,142 @@ async def export_to_excel(
             "font_color": "white",
             "border": 1,
         })
+        title_format = workbook.add_format({
+            "bold": True,
+            "font_size": 16,
+            "align": "center",
+        })
+        datetime_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
         
-        # Format header row
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
+        columns: list[str] | None = None
+        widths: list[int] = []
+        row_num = 0
         
-        # Auto-adjust column widths
-        for i, col in enumerate(df.columns):
-            max_len = max(
-                df[col].astype(str).map(len).max(),
-                len(str(col))
+        async for batch in _iter_batches(data):
+            if not batch:
+                continue
+            if columns is None:
+                # Header row; the title (if provided) takes the first cell
+                columns = list(batch[0].keys())
+                widths = [len(str(col)) for col in columns]
+                worksheet.write_row(0, 0, columns, header_format)
+                if title:
+                    worksheet.write(0, 0, title, title_format)
+            
+            # Write off the event loop so other reports/queries keep running
+            row_num = await asyncio.to_thread(
+                _write_excel_rows, worksheet, batch, columns, widths, row_num, datetime_format
             )
-            worksheet.set_column(i, i, min(max_len + 2, 50))
         
-        # Add title if provided
-        if title:
-            title_format = workbook.add_format({
-                "bold": True,
-                "font_size": 16,
-                "align": "center",
-            })
-            worksheet.write(0, 0, title, title_format)
+        if columns is None:
+            raise ValueError("Cannot export empty data")
+        
+        # Auto-adjust column widths
+        for i, width in enumerate(widths):
+            worksheet.set_column(i, i, min(width + 2, 50))
+    except BaseException:
+        # Empty data, fetch/write errors or cancellation: drop the partial file
+        with suppress(Exception):
+            workbook.close()
+        filepath.unlink(missing_ok=True)
+        raise
+    
+    await asyncio.to_thread(workbook.close)
     
     return str(filepath)
 
 
+def _write_excel_rows(
+    worksheet: Any,
+    rows: list[dict[str, Any]],
+    columns: list[str],
+    widths: list[int],
+    row_num: int,
+    datetime_format: Any = None,
+) -> int:
+    """Write rows below row_num, widening widths in place; returns the last row written."""
+    for row in rows:
+        row_num += 1
+        for i, col in enumerate(columns):
+            value = row.get(col)
+            if isinstance(value, datetime):
+                # Dates use the workbook's default_date_format
+                worksheet.write_datetime(row_num, i, value, datetime_format)
+            else:
+                if value is not None and not isinstance(value, _EXCEL_NATIVE_TYPES):
+                    value = str(value)
+                worksheet.write(row_num, i, value)
+            
+            # Track column widths as rows go by instead of a second pass
+            length = len(str(value))
+            if length > widths[i]:
+                widths[i] = length
+    return row_num
+
+
 async def export_to_pdf(
-    data: list[dict[str, Any]],
+    data: list[dict[str, Any]] | AsyncIterable[list[dict[str, Any]]],
     filename: str | None = None,
     title: str | None = None,
 ) -> str:
     """
     Export data to PDF file with table formatting.
     
+    Only the first PDF_MAX_ROWS rows are rendered; rows past that are
+    counted but not kept. The document is laid out in a worker thread.
+    
     Args:
-        data: List of dictionaries containing query results
+        data: List of dictionaries, or async iterable of row batches
         filename: Output filename (without extension)
         title: Document title
     
     Returns:
         Path to exported file
     """
-    if not data:
-        raise ValueError("Cannot export empty data")
-    
     # Generate filename if not provided
     if filename is None:
         filename = f"export_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}"
     
     filepath = EXPORT_DIR / f"{filename}.pdf"
     
+    # Prepare table data
+    columns: list[str] | None = None
+    table_data: list[list[str]] = []
+    row_count = 0
+    async for batch in _iter_batches(data):
+        if batch and columns is None:
+            columns = list(batch[0].keys())
+            table_data.append(columns)  # Header row
+        remaining = max(PDF_MAX_ROWS - row_count, 0)
+        for row in batch[:remaining]:
+            table_data.append([str(row.get(col, "")) for col in columns])
+        row_count += len(batch)
+    
+    if row_count == 0:
+        raise ValueError("Cannot export empty data")
+    
+    try:
+        await asyncio.to_thread(_build_pdf, filepath, table_data, row_count, title)
+    except Exception:
+        filepath.unlink(missing_ok=True)
+        raise
+    
+    return str(filepath)
+
+
+def _build_pdf(
+    filepath: Path,
+    table_data: list[list[str]],
+    row_count: int,
+    title: str | None,
+) -> None:
+    """Lay out and write the PDF document (blocking)."""
+    # reportlab is only loaded by processes that actually render PDFs
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+    
     # Create PDF document
     doc = SimpleDocTemplate(
         str(filepath),
@@ -177,83 +297,93 @@ async def export_to_pdf(
         elements.append(Spacer(1, 12))
     
     # Add metadata
-    metadata_text = f"Generated: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')}<br/>Total Rows: {len(data)}"
+    metadata_text = f"Generated: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')}<br/>Total Rows: {row_count}"
     elements.append(Paragraph(metadata_text, styles["Normal"]))
     elements.append(Spacer(1, 20))
     
-    # Prepare table data
-    if data:
-        columns = list(data[0].keys())
-        table_data = [columns]  # Header row
-        
-        # Limit to first 100 rows for PDF (too many rows = large file)
-        for row in data[:100]:
-            table_data.append([str(row.get(col, "")) for col in columns])
-        
-        if len(data) > 100:
-            elements.append(Paragraph(
-                f"<i>Note: Showing first 100 of {len(data)} rows</i>",
-                styles["Normal"]
-            ))
-            elements.append(Spacer(1, 12))
-        
-        # Create table
-        table = Table(table_data)
+    if row_count > PDF_MAX_ROWS:
+        elements.append(Paragraph(
+            f"<i>Note: Showing first {PDF_MAX_ROWS} of {row_count} rows</i>",
+            styles["Normal"]
+        ))
+        elements.append(Spacer(1, 12))
+    
+    # LongTable splits across pages, repeating the header on each
+    table = LongTable(table_data, repeatRows=1)
+    
+    # Style table
+    table.setStyle(TableStyle([
+        # Header styling
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#4472C4")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 10),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
         
-        # Style table
-        table.setStyle(TableStyle([
-            # Header styling
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#4472C4")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 10),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-            
-            # Data row styling
-            ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 1), (-1, -1), 8),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f2f2f2")]),
-            
-            # Grid
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
+        # Data row styling
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 1), (-1, -1), 8),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f2f2f2")]),
         
-        elements.append(table)
+        # Grid
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    
+    elements.append(table)
     
     # Build PDF
     doc.build(elements)
-    
-    return str(filepath)
 
 
 async def export_to_json(
-    data: list[dict[str, Any]],
+    data: list[dict[str, Any]] | AsyncIterable[list[dict[str, Any]]],
     filename: str | None = None,
 ) -> str:
     """
     Export data to JSON file.
     
+    The array is written one row at a time, so a streamed result is never
+    held in memory all at once.
+    
     Args:
-        data: List of dictionaries containing query results
+        data: List of dictionaries, or async iterable of row batches
         filename: Output filename (without extension)
     
     Returns:
         Path to exported file
     """
-    import json
-    
-    if not data:
-        raise ValueError("Cannot export empty data")
-    
     # Generate filename if not provided
     if filename is None:
         filename = f"export_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}"
     
     filepath = EXPORT_DIR / f"{filename}.json"
+    row_count = 0
     
-    # Write JSON
-    with open(filepath, "w", encoding="utf-8") as jsonfile:
-        json.dump(data, jsonfile, indent=2, default=str)
+    # Write JSON array incrementally, formatted like json.dump(data, indent=2)
+    try:
+        with open(filepath, "wb") as jsonfile:
+            jsonfile.write(b"[")
+            async for batch in _iter_batches(data):
+                # Encode and write off the event loop so other work keeps running
+                await asyncio.to_thread(_write_json_rows, jsonfile, batch, row_count == 0)
+                row_count += len(batch)
+            jsonfile.write(b"\n]")
+    except BaseException:
+        # Don't leave a half-written export behind (fetch error, cancellation, ...)
+        filepath.unlink(missing_ok=True)
+        raise
+    
+    if row_count == 0:
+        filepath.unlink(missing_ok=True)
+        raise ValueError("Cannot export empty data")
     
     return str(filepath)
+
+
+def _write_json_rows(jsonfile: Any, rows: list[dict[str, Any]], first: bool) -> None:
+    """Append rows as JSON array elements; first marks the array's first element."""
+    for row in rows:
+        jsonfile.write(b"\n  " if first else b",\n  ")
+        jsonfile.write(orjson.dumps(row, default=str, option=_JSON_OPTIONS).replace(b"\n", b"\n  "))
+        first = False
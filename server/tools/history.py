@@ -1,13 +1,182 @@
 """
 Query history tracking and retrieval.
 """
-from datetime import datetime, timedelta, UTC
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
 from typing import Any
 
-from sqlalchemy import select, func, desc
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select, func, desc, lambda_stmt
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from server.db.models import QueryHistory, QueryStatus
+from server.cache import cache
+from server.db.models import QueryHistory, QueryStatus, QueryText
+
+logger = logging.getLogger(__name__)
+
+
+def _created_since(days: int):
+    """
+    Filter on history rows created in the last N days, computed in SQL.
+    
+    created_at holds naive UTC timestamps, so the cutoff is taken from the
+    database's clock in UTC; only the integer day count is bound.
+    """
+    cutoff = func.timezone("UTC", func.now()) - func.make_interval(0, 0, 0, days)
+    return QueryHistory.created_at >= cutoff
+
+
+# Stores each distinct (question, SQL) pair once; repeats are no-ops
+_INSERT_QUERY_TEXT = pg_insert(QueryText).on_conflict_do_nothing(
+    index_elements=[QueryText.fingerprint]
+)
+
+# History rows are append-only, so they are written with one shared Core
+# INSERT rather than through ORM objects and the unit of work
+_INSERT_QUERY_HISTORY = insert(QueryHistory.__table__)
+
+
+def query_fingerprint(question: str, sql: str) -> bytes:
+    """
+    Fingerprint a (question, SQL) pair for grouping repeated queries.
+    
+    Uses MD5 so PostgreSQL can compute the same digest when backfilling
+    existing rows (see my_db_setup_file.sql).
+    
+    Args:
+        question: Natural language question
+        sql: Generated SQL query
+    
+    Returns:
+        16-byte digest
+    """
+    return hashlib.md5(
+        f"{question}\x00{sql}".encode(), usedforsecurity=False
+    ).digest()
+
+
+def _split_entry(entry: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Split a history entry into its query_texts and query_history rows."""
+    fingerprint = query_fingerprint(entry["question"], entry["generated_sql"])
+    text_row = {
+        "fingerprint": fingerprint,
+        "question": entry["question"],
+        "generated_sql": entry["generated_sql"],
+    }
+    history_row = {
+        key: value for key, value in entry.items()
+        if key not in ("question", "generated_sql")
+    }
+    history_row["query_fingerprint"] = fingerprint
+    return text_row, history_row
+
+
+class QueryHistoryWriter:
+    """
+    Writes QueryHistory rows in the background, off the query's critical path.
+    
+    Entries are queued without awaiting the database and flushed as one
+    multi-row INSERT when max_batch_size rows are pending or flush_interval_ms
+    has passed since the first one arrived.
+    """
+    
+    def __init__(
+        self,
+        max_queue_size: int = 10_000,
+        max_batch_size: int = 100,
+        flush_interval_ms: int = 500,
+    ):
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker: asyncio.Task | None = None
+    
+    def enqueue(self, engine: AsyncEngine, entry: dict[str, Any]) -> bool:
+        """
+        Queue a history row for insertion.
+        
+        Every entry must carry the same keys so a batch is one executemany.
+        
+        Args:
+            engine: Engine to write the row with
+            entry: QueryHistory column values plus the question and
+                generated_sql, which are stored in query_texts
+        
+        Returns:
+            False if the queue is full and the entry was not queued
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((engine, entry))
+        except asyncio.QueueFull:
+            logger.warning("Query history queue full")
+            return False
+        return True
+    
+    def _ensure_worker(self) -> None:
+        """Start the writer task on the running loop (rebinds if called from a new event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Collect entries into batches: flush when full or on timeout."""
+        batch: list[tuple[AsyncEngine, dict[str, Any]]] = []
+        try:
+            while True:
+                batch.append(await self._queue.get())
+                deadline = self._loop.time() + self.flush_interval_ms / 1000
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                await self._write(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Loop is shutting down - write whatever is still pending
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+            raise
+    
+    @staticmethod
+    async def _write(batch: list[tuple[AsyncEngine, dict[str, Any]]]) -> None:
+        """Insert a batch of history rows, one transaction per engine."""
+        by_engine: dict[AsyncEngine, list[dict[str, Any]]] = {}
+        for engine, entry in batch:
+            by_engine.setdefault(engine, []).append(entry)
+        
+        for engine, entries in by_engine.items():
+            text_rows: dict[bytes, dict[str, Any]] = {}
+            history_rows = []
+            for entry in entries:
+                text_row, history_row = _split_entry(entry)
+                text_rows[text_row["fingerprint"]] = text_row
+                history_rows.append(history_row)
+            
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(_INSERT_QUERY_TEXT, list(text_rows.values()))
+                    await conn.execute(_INSERT_QUERY_HISTORY, history_rows)
+            except Exception as e:
+                logger.warning("Failed to write %d query history entries", len(entries), exc_info=e)
+
+
+# Global query history writer instance
+history_writer = QueryHistoryWriter()
 
 
 class HistoryManager:
@@ -27,6 +196,10 @@ class HistoryManager:
         """
         Log a query execution to history.
         
+        The row is queued for the background history writer, which inserts
+        queued rows in batches; it is only written through the session directly
+        if the queue is full.
+        
         Args:
             user_id: User ID
             natural_query: Natural language query
@@ -40,23 +213,26 @@ class HistoryManager:
         if session is None:
             raise ValueError("Database session is required")
         
+        entry = {
+            "user_id": user_id,
+            "question": natural_query,
+            "generated_sql": sql_query,
+            "status": QueryStatus.SUCCESS if success else QueryStatus.FAILED,
+            "result_rows": row_count if success else None,
+            "execution_time_ms": execution_time_ms if success else None,
+            "error_message": error if not success else None,
+        }
+        if history_writer.enqueue(session.bind, entry):
+            return
+        
         try:
-            history_entry = QueryHistory(
-                user_id=user_id,
-                question=natural_query,
-                generated_sql=sql_query,
-                status="success" if success else "failed",
-                result_rows=row_count if success else None,
-                execution_time_ms=execution_time_ms if success else None,
-                error_message=error if not success else None,
-            )
-            
-            session.add(history_entry)
-            await session.flush()  # Don't commit, let the caller handle that
-            print(f"✅ Query logged to history (ID: {history_entry.id})")
+            text_row, history_row = _split_entry(entry)
+            await session.execute(_INSERT_QUERY_TEXT, [text_row])
+            await session.execute(_INSERT_QUERY_HISTORY, [history_row])
+            logger.debug("Query logged to history user_id=%s", user_id)
             
         except Exception as e:
-            print(f"⚠️  Failed to log query to history: {e}")
+            logger.warning("Failed to log query to history", exc_info=e)
             # Don't raise - logging failures shouldn't break the query
     
     async def get_recent_queries(
@@ -78,32 +254,35 @@ class HistoryManager:
         Returns:
             List of query history records
         """
-        stmt = (
-            select(QueryHistory)
+        # Lambda statements are built and cache-keyed once; later calls only
+        # rebind user_id/limit/status instead of reconstructing the select
+        # Plain columns rather than QueryHistory entities: rows go straight to
+        # dicts, so ORM hydration and the identity map are pure overhead
+        stmt = lambda_stmt(
+            lambda: select(
+                QueryHistory.id,
+                QueryText.question,
+                QueryText.generated_sql.label("sql"),
+                QueryHistory.status,
+                QueryHistory.result_rows,
+                QueryHistory.execution_time_ms,
+                QueryHistory.error_message,
+                QueryHistory.created_at,
+            )
+            .join(QueryHistory.query_text)
             .where(QueryHistory.user_id == user_id)
             .order_by(desc(QueryHistory.created_at))
             .limit(limit)
         )
         
         if status:
-            stmt = stmt.where(QueryHistory.status == status)
+            stmt += lambda s: s.where(QueryHistory.status == status)
         
         result = await session.execute(stmt)
-        queries = result.scalars().all()
         
-        return [
-            {
-                "id": q.id,
-                "question": q.question,
-                "sql": q.generated_sql,
-                "status": q.status,
-                "result_rows": q.result_rows,
-                "execution_time_ms": q.execution_time_ms,
-                "error_message": q.error_message,
-                "created_at": q.created_at.isoformat(),
-            }
-            for q in queries
-        ]
+        # created_at stays a datetime; the MCP layer serializes tool results
+        # with pydantic-core, which encodes datetimes natively
+        return [dict(row) for row in result.mappings()]
     
     async def get_query_by_id(
         self,
@@ -122,27 +301,41 @@ class HistoryManager:
         Returns:
             Query history record or None if not found
         """
-        stmt = select(QueryHistory).where(
-            QueryHistory.id == query_id,
-            QueryHistory.user_id == user_id,
+        # History rows are never updated once written, so found records are
+        # cached; misses aren't, as a queued row may not be written yet
+        cached = await cache.get_history_entry(user_id, query_id)
+        if cached is not None:
+            cached["created_at"] = datetime.fromisoformat(cached["created_at"])
+            return cached
+        
+        stmt = lambda_stmt(
+            lambda: select(QueryHistory, QueryText.question, QueryText.generated_sql)
+            .join(QueryHistory.query_text)
+            .where(
+                QueryHistory.id == query_id,
+                QueryHistory.user_id == user_id,
+            )
         )
         
         result = await session.execute(stmt)
-        query = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not query:
+        if not row:
             return None
         
-        return {
+        query, question, generated_sql = row
+        entry = {
             "id": query.id,
-            "question": query.question,
-            "sql": query.generated_sql,
-            "status": query.status.value,
+            "question": question,
+            "sql": generated_sql,
+            "status": query.status,
             "result_rows": query.result_rows,
             "execution_time_ms": query.execution_time_ms,
             "error_message": query.error_message,
-            "created_at": query.created_at.isoformat(),
+            "created_at": query.created_at,
         }
+        await cache.set_history_entry(user_id, query_id, entry)
+        return entry
     
     async def get_popular_queries(
         self,
@@ -153,6 +346,9 @@ class HistoryManager:
         """
         Get most frequently executed queries.
         
+        The aggregate scans every successful query in the period, so results
+        are cached in Redis for a few minutes.
+        
         Args:
             session: Database session
             limit: Maximum number of queries to return
@@ -161,38 +357,56 @@ class HistoryManager:
         Returns:
             List of popular queries with execution counts
         """
-        cutoff_date = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days)
+        cached = await cache.get_popular_queries(days, limit)
+        if cached is not None:
+            return cached
         
-        stmt = (
+        # Aggregate the narrow history rows by fingerprint, then fetch the
+        # question and SQL for just the top groups
+        popular_stmt = (
             select(
-                QueryHistory.question,
-                QueryHistory.generated_sql,
+                QueryHistory.query_fingerprint,
                 func.count(QueryHistory.id).label("execution_count"),
                 func.avg(QueryHistory.execution_time_ms).label("avg_execution_time"),
                 func.sum(QueryHistory.result_rows).label("total_rows_returned"),
             )
             .where(
-                QueryHistory.created_at >= cutoff_date,
+                _created_since(days),
                 QueryHistory.status == QueryStatus.SUCCESS,
             )
-            .group_by(QueryHistory.question, QueryHistory.generated_sql)
+            .group_by(QueryHistory.query_fingerprint)
             .order_by(desc("execution_count"))
             .limit(limit)
+            .subquery()
+        )
+        stmt = (
+            select(
+                QueryText.question,
+                QueryText.generated_sql,
+                popular_stmt.c.execution_count,
+                popular_stmt.c.avg_execution_time,
+                popular_stmt.c.total_rows_returned,
+            )
+            .join(popular_stmt, popular_stmt.c.query_fingerprint == QueryText.fingerprint)
+            .order_by(desc(popular_stmt.c.execution_count))
         )
         
         result = await session.execute(stmt)
         queries = result.all()
         
-        return [
+        popular = [
             {
                 "question": q.question,
                 "sql": q.generated_sql,
                 "execution_count": q.execution_count,
-                "avg_execution_time_ms": round(q.avg_execution_time, 2) if q.avg_execution_time else 0,
+                "avg_execution_time_ms": round(float(q.avg_execution_time), 2) if q.avg_execution_time else 0,
                 "total_rows_returned": q.total_rows_returned or 0,
             }
             for q in queries
         ]
+        
+        await cache.set_popular_queries(days, limit, popular)
+        return popular
     
     async def get_user_statistics(
         self,
@@ -211,51 +425,26 @@ class HistoryManager:
         Returns:
             Dictionary with user statistics
         """
-        cutoff_date = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days)
-        
-        # Total queries
-        total_stmt = select(func.count(QueryHistory.id)).where(
-            QueryHistory.user_id == user_id,
-            QueryHistory.created_at >= cutoff_date,
-        )
-        total_result = await session.execute(total_stmt)
-        total_queries = total_result.scalar() or 0
-        
-        # Successful queries
-        success_stmt = select(func.count(QueryHistory.id)).where(
-            QueryHistory.user_id == user_id,
-            QueryHistory.created_at >= cutoff_date,
-            QueryHistory.status == QueryStatus.SUCCESS,
-        )
-        success_result = await session.execute(success_stmt)
-        successful_queries = success_result.scalar() or 0
-        
-        # Failed queries
-        failed_stmt = select(func.count(QueryHistory.id)).where(
-            QueryHistory.user_id == user_id,
-            QueryHistory.created_at >= cutoff_date,
-            QueryHistory.status == QueryStatus.FAILED,
-        )
-        failed_result = await session.execute(failed_stmt)
-        failed_queries = failed_result.scalar() or 0
-        
-        # Average execution time
-        avg_time_stmt = select(func.avg(QueryHistory.execution_time_ms)).where(
-            QueryHistory.user_id == user_id,
-            QueryHistory.created_at >= cutoff_date,
-            QueryHistory.status == QueryStatus.SUCCESS,
+        # All counts and aggregates in one pass over the user's recent history
+        stmt = lambda_stmt(
+            lambda: select(
+                func.count(QueryHistory.id).label("total"),
+                func.count(QueryHistory.id).filter(QueryHistory.status == QueryStatus.SUCCESS).label("success"),
+                func.count(QueryHistory.id).filter(QueryHistory.status == QueryStatus.FAILED).label("failed"),
+                func.avg(QueryHistory.execution_time_ms).filter(QueryHistory.status == QueryStatus.SUCCESS).label("avg_time"),
+                func.sum(QueryHistory.result_rows).filter(QueryHistory.status == QueryStatus.SUCCESS).label("total_rows"),
+            ).where(
+                QueryHistory.user_id == user_id,
+                _created_since(days),
+            )
         )
-        avg_time_result = await session.execute(avg_time_stmt)
-        avg_execution_time = avg_time_result.scalar() or 0
+        row = (await session.execute(stmt)).one()
         
-        # Total rows returned
-        total_rows_stmt = select(func.sum(QueryHistory.result_rows)).where(
-            QueryHistory.user_id == user_id,
-            QueryHistory.created_at >= cutoff_date,
-            QueryHistory.status == QueryStatus.SUCCESS,
-        )
-        total_rows_result = await session.execute(total_rows_stmt)
-        total_rows = total_rows_result.scalar() or 0
+        total_queries = row.total or 0
+        successful_queries = row.success or 0
+        failed_queries = row.failed or 0
+        avg_execution_time = row.avg_time or 0
+        total_rows = row.total_rows or 0
         
         return {
             "user_id": user_id,
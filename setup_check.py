@@ -3,12 +3,12 @@
 Quick setup script to initialize the database and cache connections.
 Run this to verify Phase 1 setup is working correctly.
 """
+import argparse
 import asyncio
 import sys
 
 from rich.console import Console
 from rich.panel import Panel
-from rich.table import Table
 
 console = Console()
 
@@ -74,10 +74,10 @@ async def test_redis_connection():
         console.print("[cyan]Testing Redis connection...[/cyan]")
         cache.initialize()
         
-        # Try to set and get a value
-        await cache.client.set("test_key", "test_value", ex=10)
-        value = await cache.client.get("test_key")
-        await cache.client.delete("test_key")
+        # Try to set and get a value (pipelined into one round-trip)
+        async with cache.client.pipeline(transaction=False) as pipe:
+            pipe.set("test_key", "test_value", ex=10).get("test_key").delete("test_key")
+            _, value, _ = await pipe.execute()
         
         if value.decode("utf-8") == "test_value":
             console.print("[green]✅ Redis connection successful[/green]")
@@ -94,6 +94,8 @@ async def test_redis_connection():
 
 async def display_configuration():
     """Display current configuration."""
+    from rich.table import Table
+    
     from shared.config import settings
     
     table = Table(title="Current Configuration")
@@ -101,7 +103,7 @@ async def display_configuration():
     table.add_column("Value", style="green")
     
     # Database
-    table.add_row("Database URL", settings.database_url.split("@")[-1] if "@" in settings.database_url else "***")
+    table.add_row("Database URL", settings.database_display_url)
     table.add_row("Pool Size", str(settings.database_pool_size))
     table.add_row("Max Overflow", str(settings.database_max_overflow))
     
@@ -120,8 +122,13 @@ async def display_configuration():
     console.print(table)
 
 
-async def main():
-    """Main setup and verification."""
+async def main(quiet: bool = False):
+    """
+    Main setup and verification.
+    
+    Args:
+        quiet: Skip the configuration table
+    """
     console.print(Panel.fit(
         "[bold cyan]Database Query Assistant - Phase 1 Setup[/bold cyan]\n"
         "Verifying core infrastructure...",
@@ -136,9 +143,9 @@ async def main():
     console.print()
     
     # Display configuration
-    await display_configuration()
-    
-    console.print()
+    if not quiet:
+        await display_configuration()
+        console.print()
     
     # Test connections
     db_ok = await test_database_connection()
@@ -169,8 +176,22 @@ async def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify database and cache setup")
+    parser.add_argument(
+        "--quiet", action="store_true", help="don't print the configuration table"
+    )
+    args = parser.parse_args()
+    
+    # Use the configured event loop; settings may not load yet (that's what
+    # the environment check reports), in which case keep the default loop
+    try:
+        from shared.event_loop import install_event_loop_policy
+        install_event_loop_policy()
+    except Exception:
+        pass
+    
     try:
-        asyncio.run(main())
+        asyncio.run(main(quiet=args.quiet))
     except KeyboardInterrupt:
         console.print("\n[yellow]Setup cancelled[/yellow]")
         sys.exit(1)
@@ -2,6 +2,9 @@
 Application configuration using Pydantic Settings.
 Loads environment variables from .env file.
 """
+from functools import cached_property
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -21,6 +24,8 @@ class Settings(BaseSettings):
     database_pool_size: int = Field(default=20, description="Connection pool size")
     database_max_overflow: int = Field(default=40, description="Max overflow connections")
     database_pool_timeout: int = Field(default=30, description="Pool timeout in seconds")
+    database_pool_recycle: int = Field(default=1800, description="Replace pooled connections older than this (seconds)")
+    database_pool_pre_ping: bool = Field(default=False, description="Ping connections on every pool checkout")
     
     # Redis Configuration
     redis_url: str = Field(..., description="Redis connection URL")
@@ -46,6 +51,7 @@ class Settings(BaseSettings):
     # Celery Configuration
     celery_broker_url: str = Field(..., description="Celery broker URL")
     celery_result_backend: str = Field(..., description="Celery result backend URL")
+    scheduler_concurrency: int = Field(default=4, description="Scheduled reports run concurrently per tick")
     
     # Email Configuration
     email_smtp_host: str = Field(default="smtp.gmail.com", description="SMTP server host")
@@ -70,16 +76,27 @@ class Settings(BaseSettings):
     
     # Environment
     environment: str = Field(default="development", description="Environment name")
+    event_loop: Literal["auto", "uvloop", "asyncio"] = Field(
+        default="auto", description="Event loop implementation (auto uses uvloop when installed)"
+    )
     
-    @property
+    # Settings are loaded once and not mutated, so derived values are cached
+    @cached_property
     def is_production(self) -> bool:
         """Check if running in production."""
         return self.environment.lower() == "production"
     
-    @property
+    @cached_property
     def is_development(self) -> bool:
         """Check if running in development."""
         return self.environment.lower() == "development"
+    
+    @cached_property
+    def database_display_url(self) -> str:
+        """Database URL without credentials, for display."""
+        if "@" not in self.database_url:
+            return "***"
+        return self.database_url.rsplit("@", 1)[-1]
 
 
 # Global settings instance
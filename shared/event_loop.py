@@ -0,0 +1,29 @@
+"""
+Event loop selection for the server processes.
+"""
+import asyncio
+
+from shared.config import settings
+
+
+def install_event_loop_policy() -> str:
+    """
+    Install the event loop implementation chosen by settings.event_loop.
+    
+    "uvloop" requires uvloop to be installed; "auto" uses it when available
+    and otherwise keeps asyncio's default loop. Must run before the process
+    creates its event loop.
+    
+    Returns:
+        Name of the event loop implementation in use
+    """
+    if settings.event_loop in ("auto", "uvloop"):
+        try:
+            import uvloop
+        except ImportError:
+            if settings.event_loop == "uvloop":
+                raise
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+    return "asyncio"
@@ -2,12 +2,12 @@
 import requests
 import json
 
-# Test the query endpoint
-response = requests.post(
-    'http://localhost:8000/api/query',
-    headers={'Content-Type': 'application/json'},
-    json={'question': 'How many customers do we have?', 'user_id': 1}
-)
+# Test the query endpoint (a Session keeps the connection alive for follow-up calls)
+with requests.Session() as session:
+    response = session.post(
+        'http://localhost:8000/api/query',
+        json={'question': 'How many customers do we have?', 'user_id': 1}
+    )
 
 print(f"Status Code: {response.status_code}")
 print(f"\nResponse Headers:")
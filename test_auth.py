@@ -5,6 +5,9 @@ Test script for QueryAI authentication system
 import requests
 import json
 
+# One keep-alive session so the whole flow reuses a single connection
+session = requests.Session()
+
 def test_login(username: str, password: str):
     """Test user login and return token"""
     url = "http://localhost:8000/auth/login"
@@ -14,7 +17,7 @@ def test_login(username: str, password: str):
     }
     
     try:
-        response = requests.post(url, json=data)
+        response = session.post(url, json=data)
         if response.status_code == 200:
             result = response.json()
             print(f"✅ Login successful for {username}")
@@ -35,7 +38,7 @@ def test_protected_endpoint(token: str):
     headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, headers=headers)
+        response = session.get(url, headers=headers)
         if response.status_code == 200:
             user_info = response.json()
             print(f"✅ Protected endpoint access successful")
@@ -71,4 +74,5 @@ def main():
     test_login("admin", "wrongpassword")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with session:
+        main()
\ No newline at end of file
@@ -6,33 +6,61 @@ Tests the full flow: Client -> MCP Server -> Groq AI -> SQL -> PostgreSQL -> Red
 import asyncio
 import sys
 import os
+
+import pytest
+import pytest_asyncio
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
 
-async def test_mcp_connection():
+SERVER_PARAMS = StdioServerParameters(
+    command="python",
+    args=["-m", "server.mcp_server"],
+    env={"GROQ_API_KEY": os.getenv("GROQ_API_KEY", "your_groq_api_key_here")}
+)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def session():
+    """One MCP server subprocess and initialized session shared by all tests."""
+    ready: asyncio.Future[ClientSession] = asyncio.get_running_loop().create_future()
+    done = asyncio.Event()
+    
+    # stdio_client's cancel scopes must be entered and exited by the same
+    # task, so a dedicated task owns the connection for the module's lifetime
+    async def serve():
+        async with stdio_client(SERVER_PARAMS) as (read, write):
+            async with ClientSession(read, write) as client_session:
+                await client_session.initialize()
+                ready.set_result(client_session)
+                await done.wait()
+    
+    task = asyncio.create_task(serve())
+    await asyncio.wait([ready, task], return_when=asyncio.FIRST_COMPLETED)
+    if not ready.done():
+        task.result()  # Raise the startup error
+    
+    yield ready.result()
+    
+    done.set()
+    await task
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_mcp_connection(session):
     """Test 1: Connect to MCP server and list available tools."""
     print("\n🧪 Test 1: Connecting to MCP Server...")
     
-    server_params = StdioServerParameters(
-        command="python",
-        args=["-m", "server.mcp_server"],
-        env={"GROQ_API_KEY": os.getenv("GROQ_API_KEY", "your_groq_api_key_here")}
-    )
+    # List available tools
+    tools = await session.list_tools()
+    print(f"✅ Connected! Found {len(tools.tools)} tools:")
+    for tool in tools.tools[:5]:  # Show first 5
+        print(f"   - {tool.name}: {tool.description}")
     
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            
-            # List available tools
-            tools = await session.list_tools()
-            print(f"✅ Connected! Found {len(tools.tools)} tools:")
-            for tool in tools.tools[:5]:  # Show first 5
-                print(f"   - {tool.name}: {tool.description}")
-            
-            return session, tools
+    assert tools.tools
 
 
+@pytest.mark.asyncio(loop_scope="module")
 async def test_database_query(session):
     """Test 2: Execute a natural language query."""
     print("\n🧪 Test 2: Testing database query with natural language...")
@@ -49,9 +77,10 @@ async def test_database_query(session):
     print(f"✅ Query executed!")
     print(f"Result: {result}")
     
-    return result
+    assert not result.isError
 
 
+@pytest.mark.asyncio(loop_scope="module")
 async def test_schema_info(session):
     """Test 3: Get schema information."""
     print("\n🧪 Test 3: Getting schema information...")
@@ -66,7 +95,7 @@ async def test_schema_info(session):
     print(f"✅ Schema retrieved!")
     print(f"Result: {result}")
     
-    return result
+    assert not result.isError
 
 
 async def main():
@@ -82,13 +111,7 @@ async def main():
         return 1
     
     try:
-        server_params = StdioServerParameters(
-            command="python",
-            args=["-m", "server.mcp_server"],
-            env={"GROQ_API_KEY": os.getenv("GROQ_API_KEY", "your_groq_api_key_here")}
-        )
-        
-        async with stdio_client(server_params) as (read, write):
+        async with stdio_client(SERVER_PARAMS) as (read, write):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
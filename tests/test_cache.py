@@ -2,82 +2,200 @@
 Unit Tests for Cache Layer
 """
 import pytest
-import asyncio
-from unittest.mock import Mock, AsyncMock, patch
+import fnmatch
+import json
+from unittest.mock import AsyncMock
 
 from server.cache.redis_cache import RedisCache
 
 
+class FakePipeline:
+    """Records commands and replays them against a FakeRedis on execute()"""
+    
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        results = [
+            await getattr(self._redis, name)(*args, **kwargs)
+            for name, args, kwargs in self._commands
+        ]
+        self._commands = []
+        self._redis.round_trips += 1
+        return results
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRedis:
+    """Dict-backed stand-in for redis.asyncio.Redis"""
+    
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.round_trips = 0
+    
+    @staticmethod
+    def _encode(value):
+        return value.encode() if isinstance(value, str) else value
+    
+    async def get(self, key):
+        return self.store.get(key)
+    
+    async def set(self, key, value, ex=None):
+        self.store[key] = self._encode(value)
+        if ex:
+            self.ttls[key] = ex
+        return True
+    
+    async def setex(self, key, ttl, value):
+        return await self.set(key, value, ex=ttl)
+    
+    async def mget(self, *keys):
+        if len(keys) == 1 and isinstance(keys[0], list):
+            keys = keys[0]
+        return [self.store.get(key) for key in keys]
+    
+    async def delete(self, *keys):
+        return sum(self.store.pop(key, None) is not None for key in keys)
+    
+    async def exists(self, key):
+        return int(key in self.store)
+    
+    async def incr(self, key):
+        value = int(self.store.get(key, b"0")) + 1
+        self.store[key] = str(value).encode()
+        return value
+    
+    async def scan_iter(self, match="*", count=None):
+        for key in list(self.store):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
 @pytest.fixture
 def mock_redis():
-    """Mock Redis client"""
-    redis_mock = AsyncMock()
-    redis_mock.get = AsyncMock(return_value=None)
-    redis_mock.setex = AsyncMock()
-    redis_mock.delete = AsyncMock()
-    redis_mock.exists = AsyncMock(return_value=0)
-    return redis_mock
+    """In-memory Redis fake"""
+    return FakeRedis()
 
 
 @pytest.fixture
 def cache(mock_redis):
-    """Create cache instance with mocked Redis"""
-    with patch('server.cache.redis_cache.redis.from_url', return_value=mock_redis):
-        cache = RedisCache("redis://localhost")
-        cache.client = mock_redis
-        return cache
+    """Create cache instance backed by the Redis fake"""
+    cache = RedisCache()
+    cache._client = mock_redis
+    return cache
 
 
 @pytest.mark.asyncio
 async def test_cache_set_get(cache, mock_redis):
     """Test setting and getting cache values"""
-    # Set value
-    await cache.set("test_key", {"data": "value"}, ttl=300)
-    mock_redis.setex.assert_called_once()
+    # Cache miss first
+    assert await cache.get("test_key") is None
     
-    # Get value (cache miss first)
-    result = await cache.get("test_key")
-    assert result is None
+    # Set value
+    assert await cache.set("test_key", {"data": "value"}, expire=300) is True
+    assert json.loads(mock_redis.store["test_key"]) == {"data": "value"}
+    assert mock_redis.ttls["test_key"] == 300
     
-    # Simulate cache hit
-    import json
-    mock_redis.get.return_value = json.dumps({"data": "value"})
+    # Cache hit
     result = await cache.get("test_key")
     assert result == {"data": "value"}
 
 
 @pytest.mark.asyncio
-async def test_cache_delete(cache, mock_redis):
-    """Test cache deletion"""
-    await cache.delete("test_key")
-    mock_redis.delete.assert_called_once_with("test_key")
+async def test_invalidate_schema_cache(cache, mock_redis):
+    """Test only the given table's schema metadata is removed"""
+    await cache.set_schema_metadata("db", "users", {"columns": ["id"]})
+    await cache.set_schema_metadata("db", "orders", {"columns": ["id"]})
+    
+    await cache.invalidate_schema_cache("db", "users")
+    assert await cache.get_schema_metadata("db", "users") is None
+    assert await cache.get_schema_metadata("db", "orders") == {"columns": ["id"]}
 
 
 @pytest.mark.asyncio
-async def test_cache_exists(cache, mock_redis):
-    """Test cache existence check"""
-    mock_redis.exists.return_value = 1
-    exists = await cache.exists("test_key")
-    assert exists is True
+async def test_invalidate_query_cache(cache, mock_redis):
+    """Test every cached query result is removed, other keys are kept"""
+    await cache.set_query_result("SELECT 1", {"rows": [[1]]})
+    await cache.set_user_query_result(
+        "SELECT 1", user_id=1, executed_sql="SELECT 1", columns=["a"], rows=[[1]]
+    )
+    await cache.set_schema_metadata("db", "users", {"columns": ["id"]})
     
-    mock_redis.exists.return_value = 0
-    exists = await cache.exists("test_key")
-    assert exists is False
+    await cache.invalidate_query_cache()
+    assert list(mock_redis.store) == ["schema:meta:db:users"]
 
 
-@pytest.mark.asyncio
-async def test_cache_key_generation():
+def test_cache_key_generation():
     """Test cache key generation"""
-    from server.cache.redis_cache import generate_cache_key
-    
-    key = generate_cache_key("query", user_id=1, query="SELECT * FROM users")
-    assert "query" in key
-    assert "1" in key
+    key = RedisCache._generate_query_key("SELECT * FROM users", {"id": 1})
+    assert key.startswith(RedisCache.QUERY_RESULT_PREFIX)
     
-    # Same inputs should generate same key
-    key2 = generate_cache_key("query", user_id=1, query="SELECT * FROM users")
-    assert key == key2
+    # Same inputs should generate same key, regardless of param order
+    assert key == RedisCache._generate_query_key("SELECT * FROM users", {"id": 1})
+    assert RedisCache._generate_query_key("SELECT 1", {"a": 1, "b": 2}) == (
+        RedisCache._generate_query_key("SELECT 1", {"b": 2, "a": 1})
+    )
     
     # Different inputs should generate different keys
-    key3 = generate_cache_key("query", user_id=2, query="SELECT * FROM users")
-    assert key != key3
+    assert key != RedisCache._generate_query_key("SELECT * FROM users", {"id": 2})
+    
+    # Per-user keys differ between users
+    assert RedisCache._generate_user_query_key("SELECT 1", user_id=1) != (
+        RedisCache._generate_user_query_key("SELECT 1", user_id=2)
+    )
+
+
+@pytest.mark.asyncio
+async def test_user_query_result_respects_permission_version(cache, mock_redis):
+    """Test cached results are dropped once the user's permissions change"""
+    await cache.set_user_query_result(
+        "SELECT 1", user_id=1, executed_sql="SELECT 1", columns=["a"], rows=[[1]]
+    )
+    result = await cache.get_user_query_result("SELECT 1", user_id=1)
+    assert result["rows"] == [[1]]
+    
+    await cache.bump_permission_version(1)
+    assert await cache.get_user_query_result("SELECT 1", user_id=1) is None
+
+
+@pytest.mark.asyncio
+async def test_set_many_uses_single_pipeline(cache, mock_redis):
+    """Test several values are written in one pipelined round-trip"""
+    assert await cache.set_many({"a": {"x": 1}, "b": {"y": 2}}, expire=60) is True
+    assert mock_redis.round_trips == 1
+    assert await cache.get_many(["a", "b", "c"]) == [{"x": 1}, {"y": 2}, None]
+    assert mock_redis.ttls == {"a": 60, "b": 60}
+
+
+@pytest.mark.asyncio
+async def test_get_many_degrades_to_misses(cache, mock_redis):
+    """Test a failing MGET is treated as a cache miss for every key"""
+    mock_redis.mget = AsyncMock(side_effect=ConnectionError("down"))
+    
+    assert await cache.get_many(["a", "b"]) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_permissions(cache, mock_redis):
+    """Test only the user's permission keys are removed"""
+    await cache.set_user_permissions_many(1, "db", {"orders": {"can_read": True}})
+    await cache.set_user_permissions_many(2, "db", {"orders": {"can_read": True}})
+    
+    await cache.invalidate_user_permissions(1)
+    assert list(mock_redis.store) == ["user:perm:2:db:orders"]
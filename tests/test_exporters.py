@@ -0,0 +1,59 @@
+"""
+Unit Tests for Result Exporters
+"""
+import pytest
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import openpyxl
+
+from server.tools import exporters
+
+
+@pytest.mark.asyncio
+async def test_excel_export_writes_non_native_values(tmp_path, monkeypatch):
+    """Test UUID/json values are written as text and dates get a date format"""
+    monkeypatch.setattr(exporters, "EXPORT_DIR", tmp_path)
+    row_id = uuid.uuid4()
+    rows = [{
+        "id": row_id,
+        "meta": {"plan": "pro"},
+        "tags": ["a", "b"],
+        "joined": date(2024, 1, 2),
+        "seen_at": datetime(2024, 1, 2, 3, 4, 5),
+        "balance": Decimal("12.50"),
+        "note": None,
+    }]
+
+    path = await exporters.export_to_excel(rows, filename="values")
+
+    sheet = openpyxl.load_workbook(path).active
+    cells = next(sheet.iter_rows(min_row=2, max_row=2))
+    assert [cell.value for cell in cells[:3]] == [str(row_id), "{'plan': 'pro'}", "['a', 'b']"]
+    assert cells[3].value == datetime(2024, 1, 2)
+    assert cells[3].number_format == "yyyy-mm-dd"
+    assert cells[4].value == datetime(2024, 1, 2, 3, 4, 5)
+    assert cells[4].number_format == "yyyy-mm-dd hh:mm:ss"
+    assert cells[5].value == 12.5
+    assert cells[6].value is None
+
+
+@pytest.mark.parametrize("export", [
+    exporters.export_to_csv,
+    exporters.export_to_excel,
+    exporters.export_to_json,
+], ids=["csv", "excel", "json"])
+@pytest.mark.asyncio
+async def test_failed_stream_leaves_no_partial_file(tmp_path, monkeypatch, export):
+    """Test an error while streaming rows removes the half-written export"""
+    monkeypatch.setattr(exporters, "EXPORT_DIR", tmp_path)
+
+    async def batches():
+        yield [{"id": 1}]
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        await export(batches(), filename="partial")
+
+    assert list(tmp_path.iterdir()) == []
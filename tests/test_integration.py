@@ -3,14 +3,58 @@ Integration Tests for MCP Server
 """
 import pytest
 import asyncio
+import json
+from dataclasses import dataclass
 from unittest.mock import AsyncMock, patch
 
-from client.mcp_client import QueryAssistantClient
 
+@dataclass
+class FakeContent:
+    """Plain stand-in for an MCP text content item"""
+    text: str
 
-@pytest.fixture
-async def mock_server():
-    """Mock MCP server responses"""
+
+@dataclass
+class FakeResult:
+    """Plain stand-in for an MCP call_tool result"""
+    content: list[FakeContent]
+
+
+def tool_result(payload) -> FakeResult:
+    """Build a call_tool result carrying a payload as one JSON text item"""
+    return FakeResult(content=[FakeContent(text=json.dumps(payload))])
+
+
+# Server payloads, with their tool results built once for the module
+QUERY_PAYLOAD = {
+    "results": [{"id": 1, "name": "Test"}],
+    "row_count": 1,
+    "column_count": 2,
+    "execution_time_ms": 50.0,
+    "cached": False,
+}
+SAVE_PAYLOAD = {"query_id": 123}
+TABLES_PAYLOAD = ["users", "products", "orders"]
+EXPORT_PAYLOAD = {"file_path": "/path/to/export.xlsx"}
+SCHEDULE_PAYLOAD = {"schedule_id": 456}
+
+QUERY_RESULT = tool_result(QUERY_PAYLOAD)
+SAVE_RESULT = tool_result(SAVE_PAYLOAD)
+TABLES_RESULT = tool_result(TABLES_PAYLOAD)
+EXPORT_RESULT = tool_result(EXPORT_PAYLOAD)
+SCHEDULE_RESULT = tool_result(SCHEDULE_PAYLOAD)
+
+
+@pytest.fixture(scope="module")
+def client_class():
+    """Import the MCP client on first use rather than at collection time"""
+    from client.mcp_client import QueryAssistantClient
+    return QueryAssistantClient
+
+
+@pytest.fixture(scope="module")
+def mock_server():
+    """Mock MCP server responses (tests set call_tool.return_value themselves)"""
     with patch('client.mcp_client.stdio_client') as mock:
         mock_session = AsyncMock()
         mock_session.call_tool = AsyncMock()
@@ -20,33 +64,23 @@ async def mock_server():
 
 
 @pytest.mark.asyncio
-async def test_query_database(mock_server):
+async def test_query_database(client_class, mock_server):
     """Test query execution through MCP"""
     # Mock response
-    mock_server.call_tool.return_value = AsyncMock(
-        content=[
-            AsyncMock(
-                text='{"results": [{"id": 1, "name": "Test"}], "row_count": 1, "column_count": 2, "execution_time_ms": 50.0, "cached": false}'
-            )
-        ]
-    )
+    mock_server.call_tool.return_value = QUERY_RESULT
     
-    async with QueryAssistantClient() as client:
+    async with client_class() as client:
         result = await client.query_database("Show test data", user_id=1)
         
-        assert result is not None
-        assert "results" in result
-        assert result["row_count"] == 1
+        assert result == QUERY_PAYLOAD
 
 
 @pytest.mark.asyncio
-async def test_save_query(mock_server):
+async def test_save_query(client_class, mock_server):
     """Test saving a query through MCP"""
-    mock_server.call_tool.return_value = AsyncMock(
-        content=[AsyncMock(text='{"query_id": 123}')]
-    )
+    mock_server.call_tool.return_value = SAVE_RESULT
     
-    async with QueryAssistantClient() as client:
+    async with client_class() as client:
         result = await client.save_query(
             user_id=1,
             name="Test Query",
@@ -60,13 +94,11 @@ async def test_save_query(mock_server):
 
 
 @pytest.mark.asyncio
-async def test_list_tables(mock_server):
+async def test_list_tables(client_class, mock_server):
     """Test listing tables through MCP"""
-    mock_server.call_tool.return_value = AsyncMock(
-        content=[AsyncMock(text='["users", "products", "orders"]')]
-    )
+    mock_server.call_tool.return_value = TABLES_RESULT
     
-    async with QueryAssistantClient() as client:
+    async with client_class() as client:
         tables = await client.list_tables()
         
         assert isinstance(tables, list)
@@ -75,13 +107,11 @@ async def test_list_tables(mock_server):
 
 
 @pytest.mark.asyncio
-async def test_export_query_results(mock_server):
+async def test_export_query_results(client_class, mock_server):
     """Test exporting query results"""
-    mock_server.call_tool.return_value = AsyncMock(
-        content=[AsyncMock(text='{"file_path": "/path/to/export.xlsx"}')]
-    )
+    mock_server.call_tool.return_value = EXPORT_RESULT
     
-    async with QueryAssistantClient() as client:
+    async with client_class() as client:
         result = await client.export_query_results(
             user_id=1,
             query="Show test data",
@@ -93,13 +123,11 @@ async def test_export_query_results(mock_server):
 
 
 @pytest.mark.asyncio
-async def test_create_scheduled_report(mock_server):
+async def test_create_scheduled_report(client_class, mock_server):
     """Test creating a scheduled report"""
-    mock_server.call_tool.return_value = AsyncMock(
-        content=[AsyncMock(text='{"schedule_id": 456}')]
-    )
+    mock_server.call_tool.return_value = SCHEDULE_RESULT
     
-    async with QueryAssistantClient() as client:
+    async with client_class() as client:
         result = await client.create_scheduled_report(
             user_id=1,
             name="Daily Report",
@@ -2,126 +2,181 @@
 Unit Tests for Database Models and Connections
 """
 import pytest
-import asyncio
 from datetime import datetime
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
-from server.db.models import Base, User, QueryHistory, SavedQuery, ScheduledReport
+from server.db.models import (
+    Base,
+    QueryHistory,
+    QueryText,
+    ReportFormat,
+    ReportStatus,
+    SavedQuery,
+    ScheduledReport,
+    User,
+)
+from server.tools.history import query_fingerprint
 
 
-@pytest.fixture
-async def test_engine():
-    """Create test database engine"""
-    engine = create_async_engine(
-        "sqlite+aiosqlite:///:memory:",
-        echo=False
+@pytest.fixture(scope="session")
+def test_engine():
+    """Create test database engine (schema is created once per test run)"""
+    # Plain sqlite3: these tests only exercise the mappings, and the async
+    # driver would hop every statement through a worker thread
+    engine = create_engine(
+        "sqlite://",
+        echo=False,
+        poolclass=StaticPool,  # Keep the connection (and the memory DB) alive
     )
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    @event.listens_for(engine, "connect")
+    def set_test_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself so savepoints behave
+        dbapi_connection.isolation_level = None
+        # Durability is irrelevant for a throwaway test database
+        cursor = dbapi_connection.cursor()
+        for pragma in (
+            "synchronous=OFF",
+            "journal_mode=MEMORY",
+            "locking_mode=EXCLUSIVE",
+            "temp_store=MEMORY",
+        ):
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+    
+    @event.listens_for(engine, "begin")
+    def begin_transaction(conn):
+        conn.exec_driver_sql("BEGIN")
+    
+    Base.metadata.create_all(engine)
     
     yield engine
     
-    await engine.dispose()
+    engine.dispose()
 
 
 @pytest.fixture
-async def test_session(test_engine):
-    """Create test database session"""
-    async_session = sessionmaker(
-        test_engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-    
-    async with async_session() as session:
-        yield session
+def test_session(test_engine):
+    """Create test database session, rolled back after each test"""
+    with test_engine.connect() as conn:
+        conn.begin()
+        # Tests only flush; anything that does commit just releases a
+        # savepoint, and the outer transaction is rolled back so tests
+        # don't see each other's rows
+        with Session(
+            bind=conn,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        ) as session:
+            yield session
+        conn.rollback()
 
 
-@pytest.mark.asyncio
-async def test_user_creation(test_session):
-    """Test creating a user"""
+@pytest.fixture
+def sample_user(test_session):
+    """Flush a user to own the records created by a test"""
     user = User(
         username="testuser",
         email="test@example.com",
+        hashed_password="not-a-real-hash",
+        role="admin",
+    )
+    test_session.add(user)
+    test_session.flush()
+    return user
+
+
+def test_user_creation(test_session):
+    """Test creating a user"""
+    user = User(
+        username="newuser",
+        email="new@example.com",
+        hashed_password="not-a-real-hash",
         role="analyst",
         is_active=True
     )
     
     test_session.add(user)
-    await test_session.commit()
+    test_session.flush()
     
     assert user.id is not None
-    assert user.username == "testuser"
+    assert user.username == "newuser"
     assert user.created_at is not None
 
 
-@pytest.mark.asyncio
-async def test_query_history(test_session):
+def test_query_history(test_session, sample_user):
     """Test query history creation"""
-    user = User(username="testuser", email="test@example.com", role="admin")
-    test_session.add(user)
-    await test_session.commit()
-    
+    question = "Show top customers"
+    sql = "SELECT * FROM customers LIMIT 10"
+    fingerprint = query_fingerprint(question, sql)
     history = QueryHistory(
-        user_id=user.id,
-        natural_query="Show top customers",
-        sql_query="SELECT * FROM customers LIMIT 10",
+        # Postgres fills id from its identity column; SQLite can't
+        # autoincrement a composite primary key, so set it here
+        id=1,
+        user_id=sample_user.id,
+        query_text=QueryText(fingerprint=fingerprint, question=question, generated_sql=sql),
+        status="success",
         execution_time_ms=150.5,
-        row_count=10,
-        cached=False
+        result_rows=10,
     )
     
     test_session.add(history)
-    await test_session.commit()
+    test_session.flush()
     
-    assert history.id is not None
-    assert history.user_id == user.id
+    assert history.created_at is not None
+    assert history.user_id == sample_user.id
+    assert history.query_fingerprint == fingerprint
     assert history.execution_time_ms == 150.5
 
 
-@pytest.mark.asyncio
-async def test_saved_query(test_session):
+def test_saved_query(test_session, sample_user):
     """Test saved query creation"""
-    user = User(username="testuser", email="test@example.com", role="admin")
-    test_session.add(user)
-    await test_session.commit()
-    
     saved = SavedQuery(
-        user_id=user.id,
+        user_id=sample_user.id,
         name="Top Customers",
         description="Shows top 10 customers",
-        natural_query="Show top 10 customers by revenue"
+        question="Show top 10 customers by revenue",
+        generated_sql="SELECT * FROM customers ORDER BY revenue DESC LIMIT 10",
     )
     
     test_session.add(saved)
-    await test_session.commit()
+    test_session.flush()
     
     assert saved.id is not None
     assert saved.name == "Top Customers"
+    assert saved.usage_count == 0
 
 
-@pytest.mark.asyncio
-async def test_scheduled_report(test_session):
+def test_scheduled_report(test_session, sample_user):
     """Test scheduled report creation"""
-    user = User(username="testuser", email="test@example.com", role="admin")
-    test_session.add(user)
-    await test_session.commit()
-    
+    saved = SavedQuery(
+        user_id=sample_user.id,
+        name="Today's Sales",
+        question="Show today's sales",
+        generated_sql="SELECT * FROM sales WHERE sold_on = CURRENT_DATE",
+    )
     report = ScheduledReport(
-        user_id=user.id,
+        user_id=sample_user.id,
+        saved_query=saved,
         name="Daily Report",
-        natural_query="Show today's sales",
-        schedule="0 9 * * *",
-        email="user@example.com",
-        export_format="excel",
-        is_active=True
+        schedule_cron="0 9 * * *",
+        recipients=["user@example.com"],
+        format=ReportFormat.EXCEL,
     )
     
     test_session.add(report)
-    await test_session.commit()
+    test_session.flush()
     
     assert report.id is not None
-    assert report.schedule == "0 9 * * *"
+    assert report.saved_query_id == saved.id
+    assert report.schedule_cron == "0 9 * * *"
     assert report.is_active is True
+    assert report.status == ReportStatus.ACTIVE
+
+
+def test_rows_do_not_leak_between_tests(test_session):
+    """Test each test's rows are rolled back at teardown"""
+    assert test_session.scalar(select(func.count()).select_from(User)) == 0
+    assert test_session.scalar(select(func.count()).select_from(SavedQuery)) == 0
@@ -0,0 +1,66 @@
+"""
+Unit Tests for the In-Process Report Job Queue
+"""
+import pytest
+
+from server import mcp_server
+from server.mcp_server import ReportJob
+
+
+@pytest.fixture
+def report_jobs(monkeypatch):
+    """Empty job status table for the test"""
+    jobs = {}
+    monkeypatch.setattr(mcp_server, "_REPORT_JOBS", jobs)
+    return jobs
+
+
+def _job_entry(job_id: str, status: str) -> dict:
+    return {"job_id": job_id, "report_id": 1, "user_id": 1, "status": status, "result": None}
+
+
+def test_eviction_keeps_pending_jobs(report_jobs):
+    """Test only finished jobs are evicted when the table is full"""
+    for i in range(mcp_server._MAX_TRACKED_JOBS - 2):
+        report_jobs[f"queued-{i}"] = _job_entry(f"queued-{i}", "queued")
+    report_jobs["done"] = _job_entry("done", "completed")
+    report_jobs["running"] = _job_entry("running", "running")
+
+    mcp_server._evict_finished_report_jobs()
+    assert "done" not in report_jobs
+    assert len(report_jobs) == mcp_server._MAX_TRACKED_JOBS - 1
+
+    # Nothing left to evict: pending jobs are never dropped
+    report_jobs["late"] = _job_entry("late", "queued")
+    mcp_server._evict_finished_report_jobs()
+    assert len(report_jobs) == mcp_server._MAX_TRACKED_JOBS
+    assert "queued-0" in report_jobs
+
+
+@pytest.mark.asyncio
+async def test_process_job_records_outcome(report_jobs, monkeypatch):
+    """Test a job's result and final status are stored"""
+    async def run_report(report_id, user_id):
+        return {"status": "success", "row_count": 3}
+    monkeypatch.setattr(mcp_server, "_run_report", run_report)
+    report_jobs["job"] = _job_entry("job", "queued")
+
+    await mcp_server._process_report_job(ReportJob(job_id="job", report_id=1, user_id=1))
+
+    assert report_jobs["job"]["status"] == "completed"
+    assert report_jobs["job"]["result"] == {"status": "success", "row_count": 3}
+
+
+@pytest.mark.asyncio
+async def test_process_job_tolerates_missing_entry(report_jobs, monkeypatch):
+    """Test a job whose status entry is gone still runs without raising"""
+    calls = []
+    async def run_report(report_id, user_id):
+        calls.append(report_id)
+        return {"status": "success"}
+    monkeypatch.setattr(mcp_server, "_run_report", run_report)
+
+    await mcp_server._process_report_job(ReportJob(job_id="gone", report_id=7, user_id=1))
+
+    assert calls == [7]
+    assert report_jobs == {}
@@ -0,0 +1,28 @@
+"""
+Unit Tests for SQL Generator Schema Context
+"""
+from server.query.sql_generator import SchemaContext, SQLGenerator, _is_internal_table
+
+
+def test_history_partitions_are_internal():
+    """Test query_history partitions are treated like their parent table"""
+    assert _is_internal_table("query_history")
+    assert _is_internal_table("query_history_p2024_01")
+    assert _is_internal_table("query_history_default")
+    assert not _is_internal_table("orders")
+
+
+def test_context_message_skips_internal_tables():
+    """Test internal tables and history partitions stay out of the LLM prompt"""
+    tables = ["orders", "users", "query_history", "query_history_p2024_01", "query_history_default"]
+    schema_context = SchemaContext(
+        available_tables=tables,
+        table_schemas={table: ["id (integer)"] for table in tables},
+        column_names={table: ["id"] for table in tables},
+    )
+
+    message = SQLGenerator._build_context_message(schema_context)
+
+    assert "orders: id" in message
+    assert "query_history" not in message
+    assert "users:" not in message
@@ -4,64 +4,148 @@ Script to update user passwords in the QueryAI database.
 Run this script to set real passwords for existing users.
 """
 
+import csv
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 # Add the project root to the path for proper imports
 project_root = os.path.dirname(__file__)
 sys.path.insert(0, project_root)
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, bindparam, case, create_engine, select, update
 from sqlalchemy.orm import sessionmaker
 from server.db.models import User
 from server.auth.authentication import get_password_hash
 from shared.config import settings
 
-def update_user_password(username: str, new_password: str):
-    """Update password for a specific user."""
+# Password updates are plain Core statements; no ORM objects are loaded
+_users = User.__table__
+_UPDATE_PASSWORD_BY_USERNAME = (
+    update(_users)
+    .where(_users.c.username == bindparam("u"))
+    .values(hashed_password=bindparam("h"))
+)
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Build the engine once per run."""
     # Use the same database connection as the application
     DATABASE_URL = settings.database_url.replace("postgresql+asyncpg://", "postgresql://")
     
-    engine = create_engine(DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    
+    # psycopg2 sends executemany UPDATEs in batches, not one round-trip per row;
+    # the script runs one statement at a time, so one pooled connection is enough
+    return create_engine(
+        DATABASE_URL,
+        executemany_mode="values_plus_batch",
+        pool_size=1,
+        max_overflow=0,
+    )
+
+@lru_cache(maxsize=None)
+def get_session_factory() -> sessionmaker:
+    """Build the session factory once, bound to the shared engine."""
+    return sessionmaker(bind=get_engine())
+
+def update_user_password(username: str, new_password: str):
+    """Update password for a specific user."""
     try:
-        # Find user
-        user = session.query(User).filter(User.username == username).first()
-        if not user:
+        # One UPDATE ... RETURNING instead of a SELECT followed by an UPDATE
+        with get_engine().begin() as conn:
+            row = conn.execute(
+                update(_users)
+                .where(_users.c.username == username)
+                .values(hashed_password=get_password_hash(new_password))
+                .returning(_users.c.id, _users.c.role)
+            ).first()
+        
+        if row is None:
             print(f"❌ User '{username}' not found!")
             return False
         
-        # Update password
-        user.hashed_password = get_password_hash(new_password)
-        session.commit()
-        
-        print(f"✅ Password updated for user '{username}' (Role: {user.role})")
+        print(f"✅ Password updated for user '{username}' (ID: {row.id} | Role: {row.role})")
         return True
         
     except Exception as e:
-        session.rollback()
         print(f"❌ Error updating password for '{username}': {e}")
         return False
-    finally:
-        session.close()
+
+def bulk_update_passwords(path: str):
+    """
+    Update passwords for many users from a CSV of username,password rows.
+    
+    Hashing is deliberately CPU-heavy, so it runs across all cores; the
+    updates are then sent as one batched executemany in a single transaction.
+    
+    Args:
+        path: CSV file path, or "-" to read from stdin
+    """
+    if path == "-":
+        rows = list(csv.reader(sys.stdin))
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+    
+    credentials = {row[0].strip(): row[1] for row in rows if len(row) >= 2 and row[0].strip()}
+    if not credentials:
+        print("❌ No username,password rows found")
+        return False
+    
+    try:
+        with get_engine().connect() as conn:
+            existing = set(conn.execute(
+                select(_users.c.username).where(_users.c.username.in_(credentials))
+            ).scalars())
+        for username in credentials.keys() - existing:
+            print(f"❌ User '{username}' not found!")
+        
+        # Hash before opening the write transaction so it isn't held open;
+        # seed files often repeat a password, so each distinct one is hashed once
+        usernames = [username for username in credentials if username in existing]
+        passwords = list(dict.fromkeys(credentials[username] for username in usernames))
+        with ProcessPoolExecutor() as executor:
+            hashed_by_password = dict(zip(passwords, executor.map(get_password_hash, passwords)))
+        hashes = [hashed_by_password[credentials[username]] for username in usernames]
+        
+        if usernames:
+            with get_engine().begin() as conn:
+                conn.execute(
+                    _UPDATE_PASSWORD_BY_USERNAME,
+                    [{"u": username, "h": hashed} for username, hashed in zip(usernames, hashes)],
+                )
+        
+        print(f"✅ Passwords updated for {len(usernames)} user(s)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error updating passwords: {e}")
+        return False
 
 def list_users():
     """List all users in the database."""
-    DATABASE_URL = settings.database_url.replace("postgresql+asyncpg://", "postgresql://")
-    
-    engine = create_engine(DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    session = get_session_factory()()
     
     try:
-        users = session.query(User).all()
+        # The placeholder check runs in SQL, so hashes never leave the server;
+        # rows are streamed in batches rather than loaded all at once
+        users = session.execute(
+            select(
+                _users.c.id,
+                _users.c.username,
+                _users.c.role,
+                case(
+                    (_users.c.hashed_password.like("%dummy_hash_replace_later%"), True),
+                    else_=False,
+                ).label("needs_update"),
+            )
+            .order_by(_users.c.id)
+            .execution_options(yield_per=500)
+        )
         print("\\n📋 Current Users:")
         print("-" * 50)
         for user in users:
-            needs_update = "dummy_hash_replace_later" in user.hashed_password
-            status = "🔐 NEEDS PASSWORD" if needs_update else "✅ Password Set"
+            status = "🔐 NEEDS PASSWORD" if user.needs_update else "✅ Password Set"
             print(f"ID: {user.id} | Username: {user.username} | Role: {user.role} | {status}")
         print("-" * 50)
         
@@ -78,22 +162,26 @@ def main():
         print("Usage:")
         print("  python update_passwords.py list                    # List all users")
         print("  python update_passwords.py <username> <password>   # Update password")
+        print("  python update_passwords.py bulk <users.csv|->      # Update many (username,password rows)")
         print()
         print("Examples:")
         print("  python update_passwords.py list")
         print("  python update_passwords.py admin admin123")
         print("  python update_passwords.py analyst data456")
         print("  python update_passwords.py viewer view789")
+        print("  python update_passwords.py bulk users.csv")
         return
     
     if sys.argv[1] == "list":
         list_users()
+    elif sys.argv[1] == "bulk" and len(sys.argv) == 3:
+        bulk_update_passwords(sys.argv[2])
     elif len(sys.argv) == 3:
         username = sys.argv[1]
         password = sys.argv[2]
         update_user_password(username, password)
     else:
-        print("❌ Invalid arguments. Use 'list' or provide username and password.")
+        print("❌ Invalid arguments. Use 'list', 'bulk <file>' or provide username and password.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file